@@ -1,16 +1,98 @@
-from bs4 import BeautifulSoup
-import requests
+from bs4 import BeautifulSoup, SoupStrainer
 import pandas as pd
 import numpy as np
-import time
 import re
-from urllib.parse import urljoin, urlparse, parse_qs, urlencode
+import threading
+from urllib.parse import unquote
 from datetime import datetime
+from fetch_control import ThrottledFetcher, OK, BLOCKED, ERROR
+from identity_pool import IdentityPool
+from crawl_memory import SpillBuffer, PeakRSSMonitor
+
+# ASIN in /dp/, /gp/product/, /gp/aw/d/ and /product-reviews/ paths. Sponsored
+# cards carry the product path URL-encoded inside /sspa/click?url=..., so
+# URLs are unquoted before matching.
+ASIN_PATTERN = re.compile(
+    r'/(?:dp|gp/product|gp/aw/d|product-reviews)/([A-Z0-9]{10})(?=[/?&#]|$)',
+    re.IGNORECASE
+)
+
+
+def extract_asin(url):
+    """Return the ASIN of an Amazon product URL, or None"""
+    if not url:
+        return None
+    match = ASIN_PATTERN.search(unquote(url))
+    return match.group(1).upper() if match else None
+
+
+def canonical_product_url(asin, base_url="https://www.amazon.in"):
+    """The one URL we fetch for an ASIN, without ref= or query noise"""
+    return f"{base_url}/dp/{asin}"
+
+
+class CrawlDedup:
+    """ASINs already fetched during a crawl, shared by all its pages and terms.
+
+    The first search term to see an ASIN fetches it. Later sightings under
+    the same term are skipped; under another term the fetched details are
+    reused. Either way no second request goes out.
+    """
+
+    def __init__(self):
+        self.claimed = set()  # (asin, search term) pairs already handled
+        self.owners = {}      # asin -> search term that fetched it
+        self.details = {}     # asin -> fetched product details (None if unusable)
+        # collapsed: ref=/query variants of one ASIN on the same results page
+        self.stats = {'links': 0, 'unique': 0, 'duplicates': 0, 'reused': 0, 'collapsed': 0}
+        self._lock = threading.Lock()
+
+    def claim(self, asin, search_term):
+        """Returns ('fetch', None), ('skip', None) or ('reuse', details) for an ASIN"""
+        with self._lock:
+            self.stats['links'] += 1
+            if (asin, search_term) in self.claimed:
+                self.stats['duplicates'] += 1
+                return 'skip', None
+            self.claimed.add((asin, search_term))
+
+            if asin not in self.owners:
+                self.owners[asin] = search_term
+                self.stats['unique'] += 1
+                return 'fetch', None
+            details = self.details.get(asin)
+            if details is None:
+                # Fetched by another term but unusable (or still in flight)
+                self.stats['duplicates'] += 1
+                return 'skip', None
+            self.stats['reused'] += 1
+            return 'reuse', details
+
+    def record(self, asin, details):
+        with self._lock:
+            self.details[asin] = details
+
+    def release(self, asin, search_term):
+        """Undo a 'fetch' claim that produced no answer, so a later sighting fetches it again"""
+        with self._lock:
+            self.claimed.discard((asin, search_term))
+            if self.owners.get(asin) == search_term and asin not in self.details:
+                del self.owners[asin]
+                self.stats['unique'] -= 1
+
+    def count_collapsed(self, count):
+        with self._lock:
+            self.stats['collapsed'] += count
+
+    @property
+    def fetches_saved(self):
+        return self.stats['duplicates'] + self.stats['reused'] + self.stats['collapsed']
 
 class AmazonDealsScraper:
     def __init__(self, search_term="laptop", max_pages=5, min_discount=10, 
                  min_review_count=10, min_budget=0, max_budget=float('inf'),
-                 affiliate_tag="dip090-21"):
+                 affiliate_tag="dip090-21", dataset_writer=None, fetcher=None,
+                 dedup=None, spill_threshold=None, max_body_bytes=None):
         self.search_term = search_term
         self.max_pages = max_pages
         self.min_discount = min_discount
@@ -18,6 +100,16 @@ class AmazonDealsScraper:
         self.min_budget = min_budget
         self.max_budget = max_budget
         self.affiliate_tag = affiliate_tag
+        self.dataset_writer = dataset_writer
+        self.fetcher = fetcher or ThrottledFetcher(identity_pool=IdentityPool.from_defaults())
+        self.crawl_blocked = False
+        self.shared_dedup = dedup
+        self.dedup = dedup or CrawlDedup()
+        # Bounded-memory mode: spill products to disk past spill_threshold
+        # records and stream page bodies, truncating at max_body_bytes
+        self.spill_threshold = spill_threshold
+        self.max_body_bytes = max_body_bytes
+        self.last_crawl_stats = {}
         self.base_url = "https://www.amazon.in"
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -34,18 +126,12 @@ class AmazonDealsScraper:
             return product_url
         
         try:
-            # Extract ASIN from URL
-            asin = None
-            if '/dp/' in product_url:
-                asin = product_url.split('/dp/')[1].split('/')[0].split('?')[0]
-            elif '/gp/product/' in product_url:
-                asin = product_url.split('/gp/product/')[1].split('/')[0].split('?')[0]
-            
+            asin = extract_asin(product_url)
             if not asin:
                 return product_url
             
             # Create affiliate link
-            affiliate_url = f"https://www.amazon.in/dp/{asin}?tag={self.affiliate_tag}"
+            affiliate_url = f"{canonical_product_url(asin)}?tag={self.affiliate_tag}"
             return affiliate_url
             
         except Exception as e:
@@ -183,56 +269,245 @@ class AmazonDealsScraper:
 
     def scrape_search_results(self):
         """Scrape multiple pages of search results from Amazon India"""
-        all_products = []
+        if self.spill_threshold:
+            all_products = SpillBuffer(self.spill_threshold)
+        else:
+            all_products = []
+        self.crawl_blocked = False
+        # A fresh dedup per crawl unless several crawls share one
+        self.dedup = self.shared_dedup or CrawlDedup()
+        rss_monitor = PeakRSSMonitor().start()
         
-        for page in range(1, self.max_pages + 1):
-            print(f"Scraping Amazon India page {page} of {self.max_pages}...")
-            
-            search_url = f"{self.base_url}/s?k={self.search_term}&page={page}"
-            
-            try:
-                response = requests.get(search_url, headers=self.headers)
-                response.raise_for_status()
-                soup = BeautifulSoup(response.content, "html.parser")
-                
-                product_links = soup.find_all("a", {"class": "a-link-normal"})
-                product_urls = []
-                
-                for link in product_links:
-                    href = link.get('href')
-                    if href and '/dp/' in href:
-                        full_url = urljoin(self.base_url, href)
-                        product_urls.append(full_url)
-                
-                product_urls = list(set(product_urls))
-                
-                for url in product_urls[:10]:
-                    try:
-                        time.sleep(1)
-                        product_response = requests.get(url, headers=self.headers)
-                        product_soup = BeautifulSoup(product_response.content, "html.parser")
-                        
-                        product_details = self.get_product_details(product_soup, url)
-                        
-                        if product_details['is_available']:
-                            product_details['page'] = page
-                            all_products.append(product_details)
-                            print(f"Found available product: {product_details['title'][:50]}...")
-                            
-                    except Exception as e:
-                        print(f"Error scraping product {url}: {e}")
-                        continue
+        try:
+            for page in range(1, self.max_pages + 1):
+                print(f"Scraping Amazon India page {page} of {self.max_pages}...")
+                page_products = self.scrape_search_page(page)
+                all_products.extend(page_products)
                 
-                time.sleep(2)
+                # Stream each page to the dataset as the crawl runs
+                if self.dataset_writer is not None and page_products:
+                    self.dataset_writer.write_products(page_products)
                 
-            except Exception as e:
-                print(f"Error scraping page {page}: {e}")
-                continue
+                if self.crawl_blocked:
+                    print(f"Amazon is blocking requests, stopping crawl after page {page}")
+                    break
+        finally:
+            if self.dataset_writer is not None:
+                self.dataset_writer.close()
+            rss_monitor.stop()
+        
+        self.last_crawl_stats = {
+            'products': len(all_products),
+            'spilled': getattr(all_products, 'spilled', 0),
+            'start_rss_mb': rss_monitor.start_rss / 1024 / 1024,
+            'peak_rss_mb': rss_monitor.peak_rss / 1024 / 1024,
+        }
+        print(f"Crawl memory: peak RSS {self.last_crawl_stats['peak_rss_mb']:.1f} MiB "
+              f"(started at {self.last_crawl_stats['start_rss_mb']:.1f} MiB), "
+              f"{self.last_crawl_stats['spilled']} products spilled to disk")
         
+        stats = self.dedup.stats
+        print(f"ASIN dedup: {stats['links']} product links, {stats['unique']} unique, "
+              f"{self.dedup.fetches_saved} fetches saved")
         return all_products
 
+    def scrape_search_page(self, page):
+        """Scrape one search results page and its product pages"""
+        page_products = []
+        
+        kind, product_urls = self.fetch_search_page_urls(page)
+        if kind != OK:
+            print(f"Skipping page {page}: {kind} response")
+            self.crawl_blocked = kind == BLOCKED
+            return page_products
+        
+        fetched = 0
+        for url in product_urls:
+            if fetched >= 10:
+                break
+            asin = extract_asin(url)
+            action, product_details = self.dedup.claim(asin, self.search_term)
+            if action == 'skip':
+                continue
+            if action == 'reuse':
+                product_details = dict(product_details, page=page)
+            else:
+                fetched += 1
+                kind, product_details = self.fetch_product(url, page)
+                if kind != OK:
+                    # Throttled, captcha'd or failed: a later link to it may still be fetched
+                    self.dedup.release(asin, self.search_term)
+                    if kind == BLOCKED:
+                        self.crawl_blocked = True
+                        break
+                    continue
+                # Details are only kept for reuse when other terms share the dedup
+                if self.shared_dedup is not None:
+                    self.dedup.record(asin, product_details)
+            
+            if product_details and product_details['is_available']:
+                page_products.append(product_details)
+                print(f"Found available product: {product_details['title'][:50]}...")
+        
+        return page_products
+
+    def fetch_search_page_urls(self, page):
+        """Fetch one search results page. Returns (kind, product_urls)"""
+        search_url = f"{self.base_url}/s?k={self.search_term}&page={page}"
+        
+        kind, response = self.fetcher.fetch(search_url, headers=self.headers,
+                                            max_body_bytes=self.max_body_bytes)
+        if kind != OK:
+            return kind, []
+        
+        soup = None
+        try:
+            # Only links are needed, so only <a> tags are built into a tree
+            soup = BeautifulSoup(response.content, "html.parser", parse_only=SoupStrainer("a"))
+            del response
+            
+            product_links = soup.find_all("a", {"class": "a-link-normal"})
+            product_urls = []
+            seen_asins = set()
+            dp_hrefs = []  # distinct raw /dp/ links, the ones the old crawler fetched
+            
+            # Canonical URLs in page order, one per ASIN
+            for link in product_links:
+                href = link.get('href')
+                asin = extract_asin(href)
+                if not asin:
+                    continue
+                if '/dp/' in href and href not in dp_hrefs:
+                    dp_hrefs.append(href)
+                if asin not in seen_asins:
+                    seen_asins.add(asin)
+                    product_urls.append(canonical_product_url(asin, self.base_url))
+            
+            # Fetches saved: of the first 10 /dp/ links the old crawler would
+            # have fetched, the ones that were just another URL for an ASIN
+            baseline = dp_hrefs[:10]
+            self.dedup.count_collapsed(len(baseline) - len({extract_asin(h) for h in baseline}))
+            return kind, product_urls
+        except Exception as e:
+            print(f"Error scraping page {page}: {e}")
+            return ERROR, []
+        finally:
+            # Parse trees are full of parent/child cycles; break them now
+            # instead of waiting for the cyclic GC
+            if soup is not None:
+                soup.decompose()
+
+    def fetch_search_page_candidates(self, page, deadline=None):
+        """Fetch one search results page with listing-card signals.
+
+        Returns (kind, candidates), each candidate a dict with url, asin,
+        page and prior: a deal-score estimate from the card's price, list
+        price, rating and review count, used to fetch promising products first.
+        """
+        search_url = f"{self.base_url}/s?k={self.search_term}&page={page}"
+        
+        kind, response = self.fetcher.fetch(search_url, headers=self.headers,
+                                            max_body_bytes=self.max_body_bytes, deadline=deadline)
+        if kind != OK:
+            return kind, []
+        
+        soup = None
+        try:
+            soup = BeautifulSoup(response.content, "html.parser")
+            del response
+            
+            candidates = []
+            seen_asins = set()
+            for card in soup.select("div[data-asin]"):
+                asin = (card.get("data-asin") or "").upper()
+                if len(asin) != 10 or asin in seen_asins:
+                    continue
+                seen_asins.add(asin)
+                candidates.append({
+                    'url': canonical_product_url(asin, self.base_url),
+                    'asin': asin,
+                    'page': page,
+                    'prior': self.card_prior(card),
+                })
+            
+            # Layouts without result cards: fall back to plain product links
+            for link in soup.find_all("a", {"class": "a-link-normal"}):
+                asin = extract_asin(link.get('href'))
+                if asin and asin not in seen_asins:
+                    seen_asins.add(asin)
+                    candidates.append({
+                        'url': canonical_product_url(asin, self.base_url),
+                        'asin': asin,
+                        'page': page,
+                        'prior': 0.0,
+                    })
+            return kind, candidates
+        except Exception as e:
+            print(f"Error scraping page {page}: {e}")
+            return ERROR, []
+        finally:
+            if soup is not None:
+                soup.decompose()
+
+    def card_prior(self, card):
+        """Estimate a search result card's deal score before fetching its product page"""
+        price_elem = card.select_one("span.a-price:not(.a-text-price) span.a-offscreen")
+        list_price_elem = card.select_one("span.a-price.a-text-price span.a-offscreen")
+        rating_elem = card.select_one("span.a-icon-alt")
+        reviews_elem = card.select_one("span.a-size-base.s-underline-text")
+        
+        price = self.extract_price(price_elem.text) if price_elem else None
+        list_price = self.extract_price(list_price_elem.text) if list_price_elem else None
+        if price is not None and not (self.min_budget <= price <= self.max_budget):
+            return float('-inf')  # can never pass the budget filter
+        
+        discount = self.calculate_discount(price, list_price)
+        rating_match = re.search(r'(\d+\.?\d*)', rating_elem.text) if rating_elem else None
+        rating = float(rating_match.group(1)) if rating_match else 0
+        reviews_match = re.search(r'(\d+)', reviews_elem.text.replace(',', '')) if reviews_elem else None
+        reviews = int(reviews_match.group(1)) if reviews_match else 0
+        
+        prior = discount * 0.4 + rating * 10 * 0.3 + np.log1p(reviews) * 0.7
+        if discount < self.min_discount:
+            prior -= 100  # unlikely to qualify; fetch only if time is left over
+        return prior
+
+    def fetch_product(self, url, page, deadline=None):
+        """Fetch and parse one product page. Returns (kind, details or None)"""
+        product_soup = None
+        try:
+            kind, product_response = self.fetcher.fetch(url, headers=self.headers,
+                                                        max_body_bytes=self.max_body_bytes,
+                                                        deadline=deadline)
+            if kind != OK:
+                # Captcha/throttle pages are not "unavailable" products; just skip them
+                print(f"Skipping product {url}: {kind} response")
+                return kind, None
+            
+            product_soup = BeautifulSoup(product_response.content, "html.parser")
+            del product_response
+            product_details = self.get_product_details(product_soup, url)
+            product_details['page'] = page
+            return kind, product_details
+            
+        except Exception as e:
+            print(f"Error scraping product {url}: {e}")
+            return ERROR, None
+        finally:
+            if product_soup is not None:
+                product_soup.decompose()
+
     def filter_best_deals(self, products):
         """Filter and rank available products by best deals"""
+        if isinstance(products, SpillBuffer):
+            # Rows are scored independently, so filter spilled products a chunk
+            # at a time and only keep the survivors in memory
+            frames = [self.filter_best_deals(chunk) for chunk in products.iter_chunks(500)]
+            frames = [frame for frame in frames if not frame.empty]
+            if not frames:
+                return pd.DataFrame()
+            return pd.concat(frames, ignore_index=True).sort_values('deal_score', ascending=False)
+        
         df = pd.DataFrame(products)
         if df.empty:
             return df
@@ -287,6 +562,19 @@ class AmazonDealsScraper:
         print(f"Available products with affiliate links saved to {filename}")
         return df_output
 
+    def save_to_dataset(self, products, root):
+        """Append products to the partitioned deal dataset (see deal_dataset.py)"""
+        from deal_dataset import DealDatasetWriter
+
+        if not products:
+            print("No available products found to save.")
+            return 0
+
+        with DealDatasetWriter(root, self.search_term) as writer:
+            writer.write_products(products)
+        print(f"Appended {writer.rows_written} products to dataset at {root}")
+        return writer.rows_written
+
     def display_filter_summary(self):
         """Display current filter settings"""
         print("\n" + "="*50)
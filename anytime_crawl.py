@@ -0,0 +1,137 @@
+import heapq
+import threading
+import time
+
+from amazon_scraper import CrawlDedup
+from fetch_control import OK, BLOCKED, TIMED_OUT
+
+
+class AnytimeCrawl:
+    """Deadline-driven crawl that can stop at any point with its best results so far.
+
+    Search pages are fetched first (they are cheap and yield many
+    candidates), interleaved with product fetches taken from a priority queue
+    ordered by each candidate's listing-card prior. run_until() stops before
+    a fetch that would not finish by the deadline; calling it again with a
+    later deadline continues where it left off, e.g. to refine in the
+    background after the first answer has been sent.
+    """
+
+    PRODUCTS_PER_PAGE = 3  # product fetches between search pages once the first page is in
+
+    def __init__(self, scraper):
+        self.scraper = scraper
+        self.products = []
+        self.next_page = 1
+        self.candidates = []  # heap of (-prior, order, candidate)
+        self.candidates_found = 0
+        self.candidates_fetched = 0
+        self.blocked = False
+        self._order = 0
+        self._fetch_seconds = 2.0  # running estimate of one fetch
+        self._lock = threading.Lock()
+        scraper.dedup = scraper.shared_dedup or CrawlDedup()
+
+    @property
+    def pages_done(self):
+        return self.next_page - 1
+
+    @property
+    def finished(self):
+        """True once every page and every worthwhile candidate has been fetched"""
+        budget_left = self.candidates_fetched < self.scraper.max_pages * 10
+        return self.blocked or not budget_left or (
+            self.next_page > self.scraper.max_pages and not self.candidates
+        )
+
+    def coverage(self):
+        return {
+            'pages_done': self.pages_done,
+            'max_pages': self.scraper.max_pages,
+            'candidates_found': self.candidates_found,
+            'candidates_fetched': self.candidates_fetched,
+            'finished': self.finished,
+        }
+
+    def _time_left(self, deadline):
+        return deadline - time.monotonic()
+
+    def _timed(self, fetch, *args):
+        started = time.monotonic()
+        result = fetch(*args)
+        elapsed = time.monotonic() - started
+        self._fetch_seconds = 0.7 * self._fetch_seconds + 0.3 * elapsed
+        return result
+
+    def _fetch_next_page(self, deadline):
+        page = self.next_page
+        self.next_page += 1
+        print(f"Anytime crawl: search page {page} of {self.scraper.max_pages}")
+        kind, candidates = self._timed(self.scraper.fetch_search_page_candidates, page, deadline)
+        if kind == BLOCKED:
+            self.blocked = True
+        if kind == TIMED_OUT:
+            self.next_page = page  # not fetched; try it again on the next run
+        for candidate in candidates:
+            if candidate['prior'] == float('-inf'):
+                continue
+            heapq.heappush(self.candidates, (-candidate['prior'], self._order, candidate))
+            self._order += 1
+            self.candidates_found += 1
+        return kind
+
+    def _fetch_best_candidate(self, deadline):
+        _, _, candidate = heapq.heappop(self.candidates)
+        action, details = self.scraper.dedup.claim(candidate['asin'], self.scraper.search_term)
+        if action == 'skip':
+            return OK
+        if action == 'reuse':
+            details = dict(details, page=candidate['page'])
+            kind = OK
+        else:
+            kind, details = self._timed(self.scraper.fetch_product, candidate['url'],
+                                        candidate['page'], deadline)
+            if kind == TIMED_OUT:
+                # Give the candidate back so a later run can fetch it
+                heapq.heappush(self.candidates, (-candidate['prior'], self._order, candidate))
+                self._order += 1
+                self.scraper.dedup.release(candidate['asin'], self.scraper.search_term)
+                return kind
+            if kind == BLOCKED:
+                self.blocked = True
+            self.candidates_fetched += 1
+            if kind != OK:
+                # Nothing learned about the product: a later sighting may fetch it
+                self.scraper.dedup.release(candidate['asin'], self.scraper.search_term)
+                return kind
+            if self.scraper.shared_dedup is not None:
+                self.scraper.dedup.record(candidate['asin'], details)
+
+        if details and details['is_available']:
+            self.products.append(details)
+            print(f"Found available product: {details['title'][:50]}...")
+        return kind
+
+    def run_until(self, deadline):
+        """Crawl until the deadline (a time.monotonic() value) or completion; returns products so far"""
+        with self._lock:
+            since_page = 0
+            while not self.finished:
+                if self._time_left(deadline) < self._fetch_seconds:
+                    break
+
+                want_page = self.next_page <= self.scraper.max_pages and (
+                    not self.candidates or since_page >= self.PRODUCTS_PER_PAGE
+                )
+                if want_page:
+                    kind = self._fetch_next_page(deadline)
+                    since_page = 0
+                elif self.candidates:
+                    kind = self._fetch_best_candidate(deadline)
+                    since_page += 1
+                else:
+                    break
+
+                if kind == TIMED_OUT:
+                    break
+            return list(self.products)
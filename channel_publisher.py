@@ -0,0 +1,273 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
+
+from telegram.error import BadRequest, Forbidden, RetryAfter
+
+from product_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRateLimiter:
+    """Pacing for coroutines: `rate` sends per second with bursts of up to `burst`"""
+
+    def __init__(self, rate, burst=1):
+        self.interval = 1.0 / rate
+        self.burst = burst
+        self._next_slot = 0.0  # theoretical time of the next send at the steady rate
+
+    async def wait(self):
+        """Sleep until a send slot is free; the slot is reserved before sleeping"""
+        now = time.monotonic()
+        slot = max(self._next_slot, now)
+        self._next_slot = slot + self.interval
+        start_at = slot - (self.burst - 1) * self.interval
+        if start_at > now:
+            await asyncio.sleep(start_at - now)
+
+
+class ChannelRoute:
+    """One channel and the slice of a ranked result set it should receive.
+
+    A deal goes to the channel if it is within the price band, meets the
+    discount floor, and (when `terms` are set) its title plus the search term
+    contain every token of at least one of the terms.
+    """
+
+    def __init__(self, name, chat_id, terms=None, min_price=0.0, max_price=None,
+                 min_discount=0.0, max_deals=5):
+        self.name = name
+        self.chat_id = chat_id
+        self.terms = terms or []
+        self.term_tokens = [frozenset(tokenize(term)) for term in self.terms]
+        self.min_price = min_price
+        self.max_price = max_price
+        self.min_discount = min_discount
+        self.max_deals = max_deals
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data.get('name') or str(data['chat_id']), data['chat_id'],
+            terms=data.get('terms'), min_price=float(data.get('min_price', 0)),
+            max_price=float(data['max_price']) if data.get('max_price') is not None else None,
+            min_discount=float(data.get('min_discount', 0)), max_deals=int(data.get('max_deals', 5)),
+        )
+
+    def accepts(self, deal, search_tokens):
+        if deal['current_price'] < self.min_price:
+            return False
+        if self.max_price is not None and deal['current_price'] > self.max_price:
+            return False
+        if deal['discount_percent'] < self.min_discount:
+            return False
+        if not self.term_tokens:
+            return True
+        tokens = search_tokens | set(tokenize(deal['title']))
+        return any(term <= tokens for term in self.term_tokens)
+
+    def select(self, deals, search_term):
+        """This channel's deals, in the result set's order"""
+        search_tokens = set(tokenize(search_term))
+        return [d for d in deals if self.accepts(d, search_tokens)][:self.max_deals]
+
+
+def load_routes(routes_json, default_chat_id=None):
+    """Routes from a JSON list of route objects, or one catch-all route for `default_chat_id`"""
+    routes = [ChannelRoute.from_dict(item) for item in json.loads(routes_json or '[]')]
+    if not routes and default_chat_id:
+        routes = [ChannelRoute('default', default_chat_id)]
+    return routes
+
+
+class ChannelStats:
+    """Delivery counters for one channel"""
+
+    def __init__(self):
+        self.posts = 0
+        self.messages_sent = 0
+        self.messages_failed = 0
+        self.retries = 0
+        self.total_send_seconds = 0.0
+        self.last_post_seconds = 0.0
+        self.max_post_seconds = 0.0
+        self.last_error = ''
+
+    @property
+    def average_send_seconds(self):
+        return self.total_send_seconds / self.messages_sent if self.messages_sent else 0.0
+
+    def to_dict(self):
+        return {
+            'posts': self.posts,
+            'messages_sent': self.messages_sent,
+            'messages_failed': self.messages_failed,
+            'retries': self.retries,
+            'average_send_seconds': self.average_send_seconds,
+            'last_post_seconds': self.last_post_seconds,
+            'max_post_seconds': self.max_post_seconds,
+            'last_error': self.last_error,
+        }
+
+
+class ChannelPublisher:
+    """Posts one ranked result set to every routed channel at once.
+
+    Each deal is rendered once and the text is shared by every channel that
+    gets it. Channels are delivered concurrently; messages within a channel
+    stay in order. All sends share one global limiter (Telegram allows about
+    30 messages/second per bot) and each chat has its own limiter (about 20
+    messages/minute in a channel). RetryAfter is honoured, other errors are
+    retried with backoff up to `max_attempts`, and a channel that fails is
+    skipped without holding up the others.
+    """
+
+    def __init__(self, bot, routes, global_rate=30.0, chat_rate_per_minute=20.0,
+                 chat_burst=5, max_attempts=5, base_delay=2.0):
+        self.bot = bot
+        self.routes = routes
+        self.global_limiter = AsyncRateLimiter(global_rate, burst=int(global_rate))
+        self.chat_rate = chat_rate_per_minute / 60.0
+        self.chat_burst = chat_burst
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.chat_limiters = {}  # chat id -> AsyncRateLimiter
+        self.stats = {route.name: ChannelStats() for route in routes}
+
+    async def publish(self, deals, search_term):
+        """Deliver to all routes concurrently; returns {route name: True if fully delivered}"""
+        rendered = {}  # cache key -> message text, shared across channels
+        plans = []
+        for route in self.routes:
+            selected = route.select(deals, search_term)
+            if selected:
+                plans.append((route, self.render(selected, search_term, rendered)))
+
+        results = await asyncio.gather(*(self._deliver(route, messages) for route, messages in plans))
+        delivered = {route.name: ok for (route, _), ok in zip(plans, results)}
+        for (route, _), ok in zip(plans, results):
+            stats = self.stats[route.name]
+            logger.info(f"Channel '{route.name}': {'posted' if ok else 'FAILED'} in "
+                        f"{stats.last_post_seconds:.1f}s (avg send {stats.average_send_seconds * 1000:.0f}ms, "
+                        f"{stats.messages_failed} failed, {stats.retries} retries so far)")
+        return delivered
+
+    def render(self, deals, search_term, rendered):
+        """Header, one message per deal and footer, reusing texts already in `rendered`"""
+        header_key = ('header', search_term, len(deals))
+        if header_key not in rendered:
+            rendered[header_key] = render_header(search_term, len(deals))
+        footer_key = ('footer', search_term)
+        if footer_key not in rendered:
+            rendered[footer_key] = render_footer(search_term)
+
+        messages = [rendered[header_key]]
+        for rank, deal in enumerate(deals, 1):
+            body_key = ('deal', deal['url'])
+            if body_key not in rendered:
+                rendered[body_key] = render_deal(deal)
+            messages.append("\n" + rank_emoji(rank) + rendered[body_key])
+        messages.append(rendered[footer_key])
+        return messages
+
+    def _chat_limiter(self, chat_id):
+        if chat_id not in self.chat_limiters:
+            self.chat_limiters[chat_id] = AsyncRateLimiter(self.chat_rate, burst=self.chat_burst)
+        return self.chat_limiters[chat_id]
+
+    async def _deliver(self, route, messages):
+        stats = self.stats[route.name]
+        started = time.monotonic()
+        ok = True
+        for text in messages:
+            if not await self._send(route, text, stats):
+                ok = False
+                break
+        stats.posts += 1
+        stats.last_post_seconds = time.monotonic() - started
+        stats.max_post_seconds = max(stats.max_post_seconds, stats.last_post_seconds)
+        return ok
+
+    async def _send(self, route, text, stats):
+        limiter = self._chat_limiter(route.chat_id)
+        for attempt in range(self.max_attempts):
+            await limiter.wait()
+            await self.global_limiter.wait()
+            sent_at = time.monotonic()
+            try:
+                await self.bot.send_message(
+                    chat_id=route.chat_id,
+                    text=text,
+                    parse_mode='HTML',
+                    disable_web_page_preview=False
+                )
+                stats.messages_sent += 1
+                stats.total_send_seconds += time.monotonic() - sent_at
+                return True
+            except RetryAfter as e:
+                retry_after = e.retry_after
+                wait_time = retry_after.total_seconds() if hasattr(retry_after, 'total_seconds') else retry_after
+            except (BadRequest, Forbidden) as e:
+                # Bad markup or the bot was removed from the channel: retrying won't help
+                stats.messages_failed += 1
+                stats.last_error = str(e)
+                logger.error(f"Channel '{route.name}' rejected the message: {str(e)}")
+                return False
+            except Exception as e:
+                wait_time = self.base_delay * (2 ** attempt)
+                stats.last_error = str(e)
+            stats.retries += 1
+            logger.warning(f"Channel '{route.name}' send attempt {attempt + 1} failed, "
+                           f"waiting {wait_time:.0f}s")
+            if attempt < self.max_attempts - 1:
+                await asyncio.sleep(wait_time)
+
+        stats.messages_failed += 1
+        logger.error(f"Channel '{route.name}': failed to send after {self.max_attempts} attempts")
+        return False
+
+    def stats_summary(self):
+        return {name: stats.to_dict() for name, stats in self.stats.items()}
+
+
+def rank_emoji(rank):
+    return {1: "🥇", 2: "🥈", 3: "🥉", 4: "4️⃣", 5: "5️⃣"}.get(rank, f"{rank}️⃣")
+
+
+def render_header(search_term, count):
+    current_time = datetime.now().strftime("%I:%M %p")
+    return f"""
+🚨 <b>MEGA DEALS ALERT</b> 🚨
+🔥 <b>Top {search_term.upper()} Deals</b>
+📅 <b>Found at:</b> {current_time}
+💎 <b>Premium {count} Deals</b>
+
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+            """
+
+
+def render_deal(deal):
+    """A deal's channel message without its rank emoji (the rank differs per channel)"""
+    prime_text = "🚀 Prime" if deal['prime_eligible'] else ""
+    return f""" <b>{deal['title'][:80]}...</b>
+
+💰 <b>₹{deal['current_price']:,.0f}</b> <s>₹{deal['original_price']:,.0f}</s>
+🔥 <b>{deal['discount_percent']:.0f}% OFF</b> • Save ₹{deal['savings']:,.0f}
+⭐ <b>{deal['rating']}/5</b> ({deal['review_count']} reviews) {prime_text}
+
+🛒 <a href="{deal['url']}"><b>BUY NOW</b></a>
+                """
+
+
+def render_footer(search_term):
+    return f"""
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+🤖 <b>Want more deals?</b> Use our bot!
+🔔 <b>Enable notifications</b> for instant alerts!
+
+#AmazonDeals #{search_term.replace(' ', '')} #MegaSale
+            """
@@ -9,6 +9,25 @@ class Config:
     TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', BOT_TOKEN)  # Use BOT_TOKEN as fallback
     CHANNEL_ID = os.getenv('CHANNEL_ID', '-1002774376445')
     
+    # Channel Fan-Out (JSON list of routes; empty posts everything to CHANNEL_ID), e.g.
+    # [{"name": "laptops", "chat_id": "-100...", "terms": ["laptop"], "max_price": 50000, "max_deals": 5}]
+    CHANNEL_ROUTES = os.getenv('CHANNEL_ROUTES', '')
+    CHANNEL_GLOBAL_RATE = float(os.getenv('CHANNEL_GLOBAL_RATE', '30'))  # messages/second across all chats
+    CHANNEL_MESSAGES_PER_MINUTE = float(os.getenv('CHANNEL_MESSAGES_PER_MINUTE', '20'))  # per channel
+    CHANNEL_SEND_ATTEMPTS = int(os.getenv('CHANNEL_SEND_ATTEMPTS', '5'))
+    
+    # Update Delivery Configuration ('polling' or 'webhook')
+    BOT_MODE = os.getenv('BOT_MODE', 'polling')
+    # The receiver speaks plain HTTP: WEBHOOK_URL is the public https URL of a
+    # TLS terminator (nginx, Caddy, a load balancer) that forwards to WEBHOOK_PORT
+    WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+    WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+    WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+    WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+    WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')  # generated at startup if empty
+    WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', '100'))
+    WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', '4'))
+    
     # Amazon Scraper Configuration
     AFFILIATE_TAG = os.getenv('AFFILIATE_TAG', 'dip090-21')
     SEARCH_TERM = os.getenv('SEARCH_TERM', 'laptop')
@@ -18,6 +37,61 @@ class Config:
     MIN_BUDGET = float(os.getenv('MIN_BUDGET', '20000'))
     MAX_BUDGET = float(os.getenv('MAX_BUDGET', '150000'))
     
+    # Bounded-Memory Crawling (always on for crawls of CRAWL_BOUNDED_MIN_PAGES or more)
+    CRAWL_BOUNDED_MEMORY = os.getenv('CRAWL_BOUNDED_MEMORY', 'false').lower() in ('1', 'true', 'yes')
+    CRAWL_BOUNDED_MIN_PAGES = int(os.getenv('CRAWL_BOUNDED_MIN_PAGES', '20'))
+    CRAWL_SPILL_THRESHOLD = int(os.getenv('CRAWL_SPILL_THRESHOLD', '200'))  # products kept in memory
+    CRAWL_MAX_BODY_BYTES = int(os.getenv('CRAWL_MAX_BODY_BYTES', str(5 * 1024 * 1024)))
+    
+    # Anytime Search (/deals deadline=20s answers with the best deals found in time; 0 = no deadline)
+    DEALS_DEFAULT_DEADLINE = float(os.getenv('DEALS_DEFAULT_DEADLINE', '0'))  # seconds
+    ANYTIME_REFINE = os.getenv('ANYTIME_REFINE', 'true').lower() in ('1', 'true', 'yes')
+    ANYTIME_REFINE_SECONDS = float(os.getenv('ANYTIME_REFINE_SECONDS', '120'))  # background refinement budget
+    
+    # Fetch Throttling Configuration
+    FETCH_INITIAL_RATE = float(os.getenv('FETCH_INITIAL_RATE', '1.0'))  # requests/second
+    FETCH_MAX_RATE = float(os.getenv('FETCH_MAX_RATE', '2.0'))
+    FETCH_MAX_RETRIES = int(os.getenv('FETCH_MAX_RETRIES', '3'))
+    BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', '3'))
+    BREAKER_RESET_TIMEOUT = float(os.getenv('BREAKER_RESET_TIMEOUT', '60'))  # seconds
+    BREAKER_MAX_WAIT = float(os.getenv('BREAKER_MAX_WAIT', '300'))  # seconds
+    
+    # Request Identity Pool (comma-separated proxy URLs, empty for direct requests)
+    IDENTITY_PROXIES = [p.strip() for p in os.getenv('IDENTITY_PROXIES', '').split(',') if p.strip()]
+    IDENTITY_COOL_OFF = float(os.getenv('IDENTITY_COOL_OFF', '120'))  # seconds
+    
+    # Crawl Mode ('local' crawls in the bot process, 'distributed' uses worker.py processes)
+    CRAWL_MODE = os.getenv('CRAWL_MODE', 'local')
+    WORK_QUEUE_URL = os.getenv('WORK_QUEUE_URL', 'sqlite:///crawl_queue.db')
+    WORK_QUEUE_VISIBILITY_TIMEOUT = int(os.getenv('WORK_QUEUE_VISIBILITY_TIMEOUT', '300'))  # seconds
+    WORK_QUEUE_MAX_ATTEMPTS = int(os.getenv('WORK_QUEUE_MAX_ATTEMPTS', '3'))
+    WORK_QUEUE_JOB_TIMEOUT = int(os.getenv('WORK_QUEUE_JOB_TIMEOUT', '180'))  # seconds without worker progress
+    
+    # Materialized Deal Views (empty DEAL_VIEW_TERMS disables them)
+    DEAL_VIEW_TERMS = [t.strip() for t in os.getenv('DEAL_VIEW_TERMS', '').split(',') if t.strip()]
+    DEAL_VIEW_DISCOUNT_BUCKETS = [float(d) for d in os.getenv('DEAL_VIEW_DISCOUNT_BUCKETS', f'{MIN_DISCOUNT},30,50').split(',')]
+    DEAL_VIEW_REFRESH_MINUTES = int(os.getenv('DEAL_VIEW_REFRESH_MINUTES', '30'))
+    DEAL_VIEW_MAX_AGE_MINUTES = int(os.getenv('DEAL_VIEW_MAX_AGE_MINUTES', '180'))
+    DEAL_VIEWS_PATH = os.getenv('DEAL_VIEWS_PATH', 'deal_views.json')
+    
+    # Product Search Index (inline mode)
+    PRODUCT_INDEX_MAX_PRODUCTS = int(os.getenv('PRODUCT_INDEX_MAX_PRODUCTS', '50000'))
+    PRODUCT_INDEX_SEED_DAYS = int(os.getenv('PRODUCT_INDEX_SEED_DAYS', '7'))  # days of dataset to load at startup
+    
+    # Price Alerts (/watch rules matched against every crawl)
+    ALERT_MAX_RULES_PER_USER = int(os.getenv('ALERT_MAX_RULES_PER_USER', '20'))
+    ALERT_MAX_MATCHES = int(os.getenv('ALERT_MAX_MATCHES', '10'))  # deals per notification
+    ALERT_RENOTIFY_HOURS = float(os.getenv('ALERT_RENOTIFY_HOURS', '24'))  # unless the price drops
+    
+    # Profiling (PROFILE_ENABLED profiles every /deals run; admins can also use /profile)
+    PROFILE_ENABLED = os.getenv('PROFILE_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+    ADMIN_USER_IDS = [int(u) for u in os.getenv('ADMIN_USER_IDS', '').split(',') if u.strip()]
+    
+    # Deal Dataset Configuration (empty DATASET_DIR disables dataset export)
+    DATASET_DIR = os.getenv('DATASET_DIR', 'deals_dataset')
+    DATASET_ROW_GROUP_SIZE = int(os.getenv('DATASET_ROW_GROUP_SIZE', '50'))
+    
     # Scheduler Configuration
     MORNING_DEALS_TIME = os.getenv('MORNING_DEALS_TIME', '09:00')
     EVENING_DEALS_TIME = os.getenv('EVENING_DEALS_TIME', '18:00')
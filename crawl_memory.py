@@ -0,0 +1,116 @@
+import json
+import os
+import resource
+import tempfile
+import threading
+
+
+def current_rss():
+    """Resident set size of this process in bytes"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        # No /proc (macOS): fall back to the lifetime peak, the best we have
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+
+class PeakRSSMonitor:
+    """Samples RSS in a background thread and keeps the peak seen during a crawl"""
+
+    def __init__(self, interval=0.25):
+        self.interval = interval
+        self.start_rss = 0
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.start_rss = self.peak_rss = current_rss()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='rss-monitor', daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, current_rss())
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.peak_rss = max(self.peak_rss, current_rss())
+        return self.peak_rss
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+class SpillBuffer:
+    """List-like product buffer that spills to a temporary JSONL file past `threshold` records.
+
+    Supports append/extend, len(), truthiness and iteration (spilled records
+    first, in insertion order), so it can stand in for the products list a
+    crawl returns. iter_chunks() lets consumers process it a slice at a time.
+    """
+
+    def __init__(self, threshold=200, directory=None):
+        self.threshold = threshold
+        self.directory = directory
+        self.memory = []
+        self.spilled = 0
+        self._file = None
+
+    def append(self, record):
+        self.memory.append(record)
+        if len(self.memory) >= self.threshold:
+            self._spill()
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def _spill(self):
+        if self._file is None:
+            self._file = tempfile.TemporaryFile(mode='w+', encoding='utf-8', dir=self.directory)
+        self._file.seek(0, os.SEEK_END)
+        for record in self.memory:
+            self._file.write(json.dumps(record) + '\n')
+        self.spilled += len(self.memory)
+        self.memory = []
+
+    def __len__(self):
+        return self.spilled + len(self.memory)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __iter__(self):
+        if self._file is not None:
+            self._file.flush()
+            self._file.seek(0)
+            for _ in range(self.spilled):
+                yield json.loads(self._file.readline())
+        yield from list(self.memory)
+
+    def iter_chunks(self, size=500):
+        """Yield lists of at most `size` records"""
+        chunk = []
+        for record in self:
+            chunk.append(record)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.memory = []
+        self.spilled = 0
@@ -0,0 +1,251 @@
+import csv
+import os
+import re
+import uuid
+from datetime import datetime, date
+from urllib.parse import quote, unquote
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Plain CSV partitions are used when pyarrow is missing
+    pa = None
+    pq = None
+
+# Column order and types of every partition file. Prices and counts are
+# stored as numbers so that queries don't have to re-parse strings.
+DATASET_COLUMNS = [
+    ('crawled_at', 'timestamp'),
+    ('title', 'string'),
+    ('current_price', 'float'),
+    ('original_price', 'float'),
+    ('discount_percent', 'float'),
+    ('rating', 'float'),
+    ('review_count', 'int'),
+    ('availability', 'string'),
+    ('prime_eligible', 'bool'),
+    ('page', 'int'),
+    ('original_url', 'string'),
+    ('affiliate_url', 'string'),
+]
+
+PARTITION_COLUMNS = ['date', 'search_term']
+
+
+def _arrow_schema():
+    """Build the pyarrow schema for DATASET_COLUMNS"""
+    types = {
+        'timestamp': pa.timestamp('s'),
+        'string': pa.string(),
+        'float': pa.float64(),
+        'int': pa.int64(),
+        'bool': pa.bool_(),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in DATASET_COLUMNS])
+
+
+def _to_float(value):
+    """Parse a scraped price/rating string into a float (None if empty)"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.search(r'\d+\.?\d*', str(value).replace(',', ''))
+    return float(match.group()) if match else None
+
+
+def _to_int(value):
+    """Parse a scraped count string such as '1,234 ratings' into an int"""
+    if value is None or value == '':
+        return 0
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = re.search(r'\d+', str(value).replace(',', ''))
+    return int(match.group()) if match else 0
+
+
+def to_dataset_record(product, crawled_at):
+    """Convert a scraper product dict into a typed dataset row"""
+    return {
+        'crawled_at': crawled_at,
+        'title': product.get('title', ''),
+        'current_price': _to_float(product.get('current_price')),
+        'original_price': _to_float(product.get('original_price')),
+        'discount_percent': _to_float(product.get('discount_percent')) or 0.0,
+        'rating': _to_float(product.get('rating')),
+        'review_count': _to_int(product.get('review_count')),
+        'availability': product.get('availability', ''),
+        'prime_eligible': bool(product.get('prime_eligible', False)),
+        'page': _to_int(product.get('page')),
+        'original_url': product.get('original_url', ''),
+        'affiliate_url': product.get('affiliate_url', ''),
+    }
+
+
+class DealDatasetWriter:
+    """Append-only writer for a dataset partitioned by crawl date and search term.
+
+    Layout: <root>/date=YYYY-MM-DD/search_term=<term>/part-<id>.<ext>
+
+    Each writer session creates new part files and never rewrites old ones.
+    Rows are buffered and flushed as one Parquet row group (or one block of
+    CSV rows) every `row_group_size` rows, so a crawl streams to disk while
+    it runs.
+    """
+
+    def __init__(self, root, search_term, row_group_size=50, use_parquet=None):
+        self.root = root
+        self.search_term = search_term
+        self.row_group_size = row_group_size
+        if use_parquet is None:
+            use_parquet = pq is not None
+        if use_parquet and pq is None:
+            raise ImportError("pyarrow is required for Parquet output")
+        self.use_parquet = use_parquet
+        self.rows_written = 0
+        self._buffer = []
+        self._buffer_date = None
+        self._part_path = None
+        self._parquet_writer = None
+
+    @property
+    def extension(self):
+        return 'parquet' if self.use_parquet else 'csv'
+
+    def partition_dir(self, day):
+        """Directory of the partition for a given date"""
+        term = quote(self.search_term.strip().lower(), safe='')
+        return os.path.join(self.root, f"date={day.isoformat()}", f"search_term={term}")
+
+    def write_products(self, products):
+        """Buffer scraper product dicts, flushing full row groups"""
+        crawled_at = datetime.now().replace(microsecond=0)
+        for product in products:
+            if self._buffer_date is not None and crawled_at.date() != self._buffer_date:
+                # Crossed midnight: finish the old partition first
+                self.close()
+            self._buffer_date = crawled_at.date()
+            self._buffer.append(to_dataset_record(product, crawled_at))
+            if len(self._buffer) >= self.row_group_size:
+                self.flush()
+
+    def flush(self):
+        """Write buffered rows as one row group"""
+        if not self._buffer:
+            return
+        if self._part_path is None:
+            directory = self.partition_dir(self._buffer_date)
+            os.makedirs(directory, exist_ok=True)
+            stamp = datetime.now().strftime("%H%M%S")
+            self._part_path = os.path.join(
+                directory, f"part-{stamp}-{uuid.uuid4().hex[:8]}.{self.extension}"
+            )
+
+        if self.use_parquet:
+            self._flush_parquet()
+        else:
+            self._flush_csv()
+
+        self.rows_written += len(self._buffer)
+        self._buffer = []
+
+    def _flush_parquet(self):
+        schema = _arrow_schema()
+        table = pa.Table.from_pylist(self._buffer, schema=schema)
+        if self._parquet_writer is None:
+            self._parquet_writer = pq.ParquetWriter(self._part_path, schema)
+        self._parquet_writer.write_table(table)
+
+    def _flush_csv(self):
+        names = [name for name, _ in DATASET_COLUMNS]
+        new_file = not os.path.exists(self._part_path)
+        with open(self._part_path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=names)
+            if new_file:
+                writer.writeheader()
+            writer.writerows(self._buffer)
+
+    def close(self):
+        """Flush remaining rows and finish the current part file"""
+        self.flush()
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+        self._part_path = None
+        self._buffer_date = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _list_partitions(root, start_date=None, end_date=None, search_terms=None):
+    """Yield (day, term, directory) for partitions matching the filters"""
+    if not os.path.isdir(root):
+        return
+    terms = {t.strip().lower() for t in search_terms} if search_terms else None
+
+    for date_dir in sorted(os.listdir(root)):
+        if not date_dir.startswith('date='):
+            continue
+        try:
+            day = date.fromisoformat(date_dir[len('date='):])
+        except ValueError:
+            continue
+        if start_date and day < start_date:
+            continue
+        if end_date and day > end_date:
+            continue
+
+        date_path = os.path.join(root, date_dir)
+        for term_dir in sorted(os.listdir(date_path)):
+            if not term_dir.startswith('search_term='):
+                continue
+            term = unquote(term_dir[len('search_term='):])
+            if terms is not None and term not in terms:
+                continue
+            yield day, term, os.path.join(date_path, term_dir)
+
+
+def load_deals(root, columns=None, start_date=None, end_date=None, search_terms=None):
+    """Read deals from the dataset, touching only the requested partitions and columns.
+
+    `columns` may include the partition columns 'date' and 'search_term';
+    they are filled in from the directory names rather than read from disk.
+    """
+    file_columns = None
+    if columns is not None:
+        file_columns = [c for c in columns if c not in PARTITION_COLUMNS]
+
+    frames = []
+    for day, term, directory in _list_partitions(root, start_date, end_date, search_terms):
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if name.endswith('.parquet'):
+                if pq is None:
+                    print(f"Skipping {path}: pyarrow is not installed")
+                    continue
+                df = pq.read_table(path, columns=file_columns).to_pandas()
+            elif name.endswith('.csv'):
+                if file_columns == []:
+                    # usecols=[] drops the rows too; keep one column for the row count
+                    df = pd.read_csv(path, usecols=[0]).iloc[:, :0]
+                else:
+                    df = pd.read_csv(path, usecols=file_columns)
+            else:
+                continue
+            df['date'] = day
+            df['search_term'] = term
+            frames.append(df)
+
+    if not frames:
+        return pd.DataFrame(columns=columns or [n for n, _ in DATASET_COLUMNS] + PARTITION_COLUMNS)
+
+    result = pd.concat(frames, ignore_index=True)
+    if columns is not None:
+        result = result[columns]
+    return result
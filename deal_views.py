@@ -0,0 +1,186 @@
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+
+# Threshold fields a view is materialized for
+THRESHOLD_FIELDS = ['min_discount', 'min_review_count', 'min_budget', 'max_budget']
+
+
+class DealView:
+    """Ranked deals for one search term and threshold bucket at one point in time"""
+
+    def __init__(self, search_term, thresholds, max_pages, deals, version, refreshed_at, complete=False):
+        self.search_term = search_term
+        self.thresholds = thresholds
+        self.max_pages = max_pages
+        self.deals = deals  # filter_best_deals() rows as dicts, best first
+        self.complete = complete  # False if the bucket had more deals than the view keeps
+        self.version = version
+        self.refreshed_at = refreshed_at
+
+    @property
+    def age(self):
+        """Seconds since the view was refreshed"""
+        return time.time() - self.refreshed_at
+
+    def covers(self, min_discount, min_review_count, min_budget, max_budget, max_pages):
+        """True if a query with these filters can be answered from this view.
+
+        A query with the view's own thresholds always can. A stricter one
+        only can if the view holds every deal of its bucket: filtering a
+        truncated top-N further would miss the matches ranked below the cut.
+        """
+        query = {'min_discount': min_discount, 'min_review_count': min_review_count,
+                 'min_budget': min_budget, 'max_budget': max_budget}
+        if max_pages > self.max_pages:
+            return False
+        if query == {f: self.thresholds[f] for f in THRESHOLD_FIELDS}:
+            return True
+        return self.complete and (
+            min_discount >= self.thresholds['min_discount'] and
+            min_review_count >= self.thresholds['min_review_count'] and
+            min_budget >= self.thresholds['min_budget'] and
+            max_budget <= self.thresholds['max_budget']
+        )
+
+    def select(self, min_discount, min_review_count, min_budget, max_budget):
+        """Deals matching stricter filters, still in ranked order"""
+        return [
+            d for d in self.deals
+            if d['discount_percent'] >= min_discount
+            and d['review_count_num'] >= min_review_count
+            and min_budget <= d['current_price_num'] <= max_budget
+        ]
+
+    def to_dict(self):
+        return {
+            'search_term': self.search_term,
+            'thresholds': self.thresholds,
+            'max_pages': self.max_pages,
+            'deals': self.deals,
+            'version': self.version,
+            'refreshed_at': self.refreshed_at,
+            'complete': self.complete,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['search_term'], data['thresholds'], data['max_pages'],
+                   data['deals'], data['version'], data['refreshed_at'], data.get('complete', False))
+
+
+class DealViewStore:
+    """Pre-materialized deal views for popular search terms.
+
+    Each refresh merges the new crawl's products into the products kept for
+    the term (latest copy wins, products unseen for `retain_for` seconds are
+    dropped), re-ranks them once per threshold bucket and swaps in a new view
+    version. Views are persisted to `path` so a restarted bot answers
+    immediately.
+    """
+
+    def __init__(self, path=None, buckets=None, view_size=50, max_age=3 * 3600,
+                 retain_for=6 * 3600):
+        self.path = path
+        self.buckets = buckets or []
+        self.view_size = view_size
+        self.max_age = max_age
+        self.retain_for = retain_for
+        self.views = {}      # (term, bucket tuple) -> DealView
+        self.products = {}   # term -> {url: (last_seen, product)}
+        self._lock = threading.Lock()
+        self.load()
+
+    @staticmethod
+    def normalize_term(term):
+        return ' '.join(term.lower().split())
+
+    @staticmethod
+    def bucket_key(thresholds):
+        return tuple(float(thresholds[f]) for f in THRESHOLD_FIELDS)
+
+    def update(self, scraper, products):
+        """Merge a fresh crawl for scraper.search_term and rebuild its views"""
+        term = self.normalize_term(scraper.search_term)
+        now = time.time()
+
+        with self._lock:
+            known = dict(self.products.get(term, {}))
+        for product in products:
+            known[product.get('original_url', '')] = (now, product)
+        known = {url: entry for url, entry in known.items() if now - entry[0] <= self.retain_for}
+        merged = [product for _, product in known.values()]
+
+        new_views = {}
+        for thresholds in self.buckets:
+            scraper.min_discount = thresholds['min_discount']
+            scraper.min_review_count = thresholds['min_review_count']
+            scraper.min_budget = thresholds['min_budget']
+            scraper.max_budget = thresholds['max_budget']
+            deals_df = scraper.filter_best_deals(merged)
+            deals = [] if deals_df.empty else json.loads(
+                deals_df.head(self.view_size).to_json(orient='records')
+            )
+
+            key = (term, self.bucket_key(thresholds))
+            previous = self.views.get(key)
+            new_views[key] = DealView(term, dict(thresholds), scraper.max_pages, deals,
+                                      previous.version + 1 if previous else 1, now,
+                                      complete=len(deals_df) <= self.view_size)
+
+        with self._lock:
+            self.products[term] = known
+            self.views.update(new_views)
+        self.save()
+        return list(new_views.values())
+
+    def lookup(self, search_term, min_discount, min_review_count, min_budget, max_budget, max_pages):
+        """Freshest view that can answer this query, or None"""
+        term = self.normalize_term(search_term)
+        best = None
+        with self._lock:
+            for (view_term, _), view in self.views.items():
+                if view_term != term or view.age > self.max_age:
+                    continue
+                if not view.covers(min_discount, min_review_count, min_budget, max_budget, max_pages):
+                    continue
+                # Prefer the strictest covering bucket: its top-N is most relevant
+                if best is None or view.thresholds['min_discount'] > best.thresholds['min_discount'] \
+                        or (view.thresholds['min_discount'] == best.thresholds['min_discount']
+                            and view.refreshed_at > best.refreshed_at):
+                    best = view
+        return best
+
+    def save(self):
+        """Write views to disk (products are rebuilt on the next refresh)"""
+        if not self.path:
+            return
+        with self._lock:
+            data = [view.to_dict() for view in self.views.values()]
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def load(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except ValueError as e:
+            print(f"Ignoring unreadable deal views file {self.path}: {e}")
+            return
+        for item in data:
+            view = DealView.from_dict(item)
+            self.views[(view.search_term, self.bucket_key(view.thresholds))] = view
+
+
+def view_deals_dataframe(view, min_discount, min_review_count, min_budget, max_budget):
+    """Deals from a view as the DataFrame shape filter_best_deals() returns"""
+    return pd.DataFrame(view.select(min_discount, min_review_count, min_budget, max_budget))
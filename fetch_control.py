@@ -0,0 +1,344 @@
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+# Response classes
+OK = 'ok'
+CAPTCHA = 'captcha'
+THROTTLED = 'throttled'
+NOT_FOUND = 'not_found'
+ERROR = 'error'
+BLOCKED = 'blocked'  # never sent: the host's circuit stayed open too long
+TIMED_OUT = 'timed_out'  # never sent or abandoned: the caller's deadline passed
+
+# Byte patterns, so classifying a page never decodes the whole body to str
+CAPTCHA_PATTERN = re.compile(
+    rb"validateCaptcha|Type the characters you see in this image|"
+    rb"api-services-support@amazon\.com|To discuss automated access to Amazon data",
+    re.IGNORECASE
+)
+SOFT_404_PATTERN = re.compile(
+    rb"not a functioning page on our site|<title>\s*(Amazon\.in\s*)?Page Not Found",
+    re.IGNORECASE
+)
+
+
+def classify_response(response):
+    """Classify an HTTP response as ok, captcha, throttled, not_found or error"""
+    if response is None:
+        return ERROR
+
+    status = response.status_code
+    if status in (429, 503):
+        return THROTTLED
+    if status == 404:
+        return NOT_FOUND
+    if status >= 400:
+        return ERROR
+
+    if '/errors/validateCaptcha' in response.url:
+        return CAPTCHA
+    body = response.content
+    if CAPTCHA_PATTERN.search(body):
+        return CAPTCHA
+    if SOFT_404_PATTERN.search(body):
+        return NOT_FOUND
+    return OK
+
+
+def read_limited_body(response, max_bytes=None, deadline=None):
+    """Read a streamed response body in chunks, stopping at max_bytes.
+
+    The body is stored back on the response so .content works as usual and
+    the connection is released straight away. If the deadline (a
+    time.monotonic() value) passes between chunks, requests.Timeout is raised.
+    """
+    body = bytearray()
+    try:
+        for chunk in response.iter_content(16 * 1024):
+            body += chunk
+            if max_bytes and len(body) >= max_bytes:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                raise requests.Timeout(f"Deadline passed while reading {response.url}")
+    finally:
+        response.close()
+    response._content = bytes(body)
+    response._content_consumed = True
+    return response
+
+
+class AdaptiveRateLimiter:
+    """AIMD request pacing: add a little rate on success, halve it on throttling"""
+
+    def __init__(self, initial_rate=1.0, min_rate=0.05, max_rate=2.0,
+                 increase=0.05, decrease_factor=0.5):
+        self.rate = initial_rate  # requests per second
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self, deadline=None):
+        """Block until the next request slot; returns True once it is ours.
+
+        If the slot would come after `deadline` (a time.monotonic() value) it
+        is left for someone else and False is returned without sleeping.
+        """
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            if deadline is not None and slot > deadline:
+                return False
+            self._next_slot = slot + 1.0 / self.rate
+        if slot > now:
+            time.sleep(slot - now)
+        return True
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            # Push the next slot out so the slower rate applies immediately
+            self._next_slot = max(self._next_slot, time.monotonic() + 1.0 / self.rate)
+
+
+class CircuitBreaker:
+    """Per-host circuit breaker with half-open probing.
+
+    After `failure_threshold` consecutive blocked responses the circuit opens
+    and no requests are sent for `reset_timeout` seconds. Then a single probe
+    request is let through (half-open): success closes the circuit, another
+    block re-opens it with a doubled timeout (capped at `max_reset_timeout`).
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=3, reset_timeout=60, max_reset_timeout=900):
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def time_until_retry(self):
+        """Seconds until a request may be sent (0 if one may be sent now)"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return 0
+            if self.state == self.OPEN:
+                return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+            # Half-open: only the probe may go; others wait for its outcome
+            return 1.0 if self._probe_in_flight else 0
+
+    def before_request(self):
+        """Claim the probe slot when the open timeout has passed. Returns False if not allowed."""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() < self.opened_at + self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    return False
+                self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.reset_timeout = self.base_reset_timeout
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN:
+                self.reset_timeout = min(self.max_reset_timeout, self.reset_timeout * 2)
+                self._open()
+            elif self.failures >= self.failure_threshold:
+                self._open()
+
+    def release_probe(self):
+        """Give up the probe slot without judging the host: back to OPEN at the current timeout"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._open()
+
+    def cancel_probe(self):
+        """Hand back a probe slot that produced no verdict: stay half-open so the next request probes"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probe_in_flight = False
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+
+class ThrottledFetcher:
+    """HTTP GET wrapper that classifies responses and backs off when Amazon pushes back.
+
+    One instance can be shared by several scrapers (and threads) so that the
+    request rate and circuit state are tracked per host, not per crawl.
+    With an IdentityPool, each attempt is sent with a rotated identity whose
+    headers override the caller's, and cooling identities pace the fetches.
+    """
+
+    def __init__(self, initial_rate=1.0, max_rate=2.0, max_retries=3,
+                 failure_threshold=3, reset_timeout=60, max_wait=300,
+                 timeout=30, session=None, identity_pool=None):
+        self.initial_rate = initial_rate
+        self.max_rate = max_rate
+        self.max_retries = max_retries
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.identity_pool = identity_pool
+        self.limiters = {}
+        self.breakers = {}
+        self.stats = {OK: 0, CAPTCHA: 0, THROTTLED: 0, NOT_FOUND: 0, ERROR: 0, BLOCKED: 0,
+                      TIMED_OUT: 0}
+        self._lock = threading.Lock()
+
+    def _host_state(self, host):
+        with self._lock:
+            if host not in self.limiters:
+                self.limiters[host] = AdaptiveRateLimiter(self.initial_rate, max_rate=self.max_rate)
+                self.breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self.limiters[host], self.breakers[host]
+
+    def _count(self, kind):
+        with self._lock:
+            self.stats[kind] += 1
+
+    def _acquire(self, host, breaker, max_wait):
+        """Wait for the circuit and (if pooled) an identity. Returns (allowed, identity)."""
+        waited = 0.0
+        while True:
+            identity = None
+            delay = 0
+            if self.identity_pool is not None:
+                identity = self.identity_pool.choose()
+                if identity is None:
+                    # Every identity is cooling off: the pool sets the pace
+                    delay = self.identity_pool.time_until_available() or 1.0
+            if not delay:
+                if breaker.before_request():
+                    return True, identity
+                delay = breaker.time_until_retry() or 1.0
+
+            if waited + delay > max_wait:
+                return False, None
+            time.sleep(delay)
+            waited += delay
+
+    def fetch(self, url, headers=None, max_body_bytes=None, deadline=None):
+        """GET a URL. Returns (kind, response); response is None unless something came back.
+
+        With max_body_bytes the body is streamed and truncated at that size.
+        With a deadline (time.monotonic() value) no waiting, retrying or
+        request runs past it; the fetch returns TIMED_OUT instead. A body
+        still downloading at the deadline is abandoned after its current
+        16 KB chunk.
+        """
+        host = urlparse(url).netloc
+        limiter, breaker = self._host_state(host)
+        kind, response = ERROR, None
+
+        for attempt in range(self.max_retries + 1):
+            max_wait, timeout = self.max_wait, self.timeout
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._count(TIMED_OUT)
+                    return TIMED_OUT, None
+                max_wait, timeout = min(max_wait, remaining), min(timeout, remaining)
+
+            allowed, identity = self._acquire(host, breaker, max_wait)
+            if not allowed:
+                if deadline is not None and max_wait < self.max_wait:
+                    self._count(TIMED_OUT)
+                    return TIMED_OUT, None
+                self._count(BLOCKED)
+                print(f"Circuit open for {host}, giving up on {url}")
+                return BLOCKED, None
+
+            request_headers = dict(headers or {})
+            proxies = None
+            if identity is not None:
+                request_headers.update(identity.headers)
+                proxies = identity.proxies
+
+            if not limiter.wait(deadline) or (deadline is not None and time.monotonic() >= deadline):
+                # Never sent: the probe slot goes back without re-opening the circuit
+                self._count(TIMED_OUT)
+                breaker.cancel_probe()
+                return TIMED_OUT, None
+            if deadline is not None:
+                # requests' timeout bounds each connect/read, not the whole
+                # request, so the slot wait is taken off and the body is read
+                # in chunks that are checked against the deadline
+                timeout = min(timeout, deadline - time.monotonic())
+            try:
+                response = self.session.get(url, headers=request_headers, proxies=proxies, timeout=timeout,
+                                            stream=bool(max_body_bytes) or deadline is not None)
+                if max_body_bytes or deadline is not None:
+                    read_limited_body(response, max_body_bytes, deadline)
+                kind = classify_response(response)
+            except requests.Timeout as e:
+                if deadline is not None and time.monotonic() >= deadline:
+                    self._count(TIMED_OUT)
+                    breaker.cancel_probe()
+                    return TIMED_OUT, None
+                print(f"Request error for {url}: {e}")
+                response, kind = None, ERROR
+            except requests.RequestException as e:
+                print(f"Request error for {url}: {e}")
+                response, kind = None, ERROR
+            self._count(kind)
+            if identity is not None:
+                self.identity_pool.report(identity, kind)
+
+            if kind in (OK, NOT_FOUND):
+                breaker.record_success()
+                limiter.on_success()
+                return kind, response
+
+            if kind == THROTTLED or (kind == CAPTCHA and identity is None):
+                breaker.record_failure()
+                limiter.on_throttle()
+                print(f"{kind} response from {host} (attempt {attempt + 1}), "
+                      f"slowing to {limiter.rate:.2f} req/s")
+            elif kind == CAPTCHA:
+                # A captcha burns the identity, not the host: rotate and retry
+                print(f"captcha for identity {identity.name} on {host} (attempt {attempt + 1})")
+                breaker.release_probe()
+            else:
+                # Plain errors don't say anything about throttling; just release the probe slot
+                breaker.release_probe()
+
+        return kind, response
+
+    def is_blocked(self, url):
+        """True if the host's circuit is open for longer than we are willing to wait"""
+        _, breaker = self._host_state(urlparse(url).netloc)
+        return breaker.time_until_retry() > self.max_wait
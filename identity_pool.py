@@ -0,0 +1,161 @@
+import random
+import threading
+import time
+from collections import deque
+
+from fetch_control import OK, NOT_FOUND, CAPTCHA, ERROR
+
+# Browser header sets used by default. Each one is a complete, consistent
+# identity: User-Agent, client hints and Accept headers that belong together.
+DEFAULT_HEADER_SETS = [
+    {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+        'Accept-Language': 'en-IN,en-GB;q=0.9,en;q=0.8,hi;q=0.7',
+        'Sec-CH-UA': '"Google Chrome";v="129", "Not=A?Brand";v="8", "Chromium";v="129"',
+        'Sec-CH-UA-Mobile': '?0',
+        'Sec-CH-UA-Platform': '"Windows"',
+    },
+    {
+        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/128.0.0.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+        'Accept-Language': 'en-IN,en;q=0.9',
+        'Sec-CH-UA': '"Chromium";v="128", "Not;A=Brand";v="24", "Google Chrome";v="128"',
+        'Sec-CH-UA-Mobile': '?0',
+        'Sec-CH-UA-Platform': '"macOS"',
+    },
+    {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:131.0) Gecko/20100101 Firefox/131.0',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+        'Accept-Language': 'en-IN,en-US;q=0.7,en;q=0.3',
+    },
+    {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36 Edg/129.0.0.0',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+        'Accept-Language': 'en-IN,en;q=0.9',
+        'Sec-CH-UA': '"Microsoft Edge";v="129", "Not=A?Brand";v="8", "Chromium";v="129"',
+        'Sec-CH-UA-Mobile': '?0',
+        'Sec-CH-UA-Platform': '"Windows"',
+    },
+    {
+        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.6 Safari/605.1.15',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'en-IN,en-GB;q=0.9,en;q=0.8',
+    },
+]
+
+
+class RequestIdentity:
+    """One request identity (header set + optional proxy) and its recent health"""
+
+    def __init__(self, name, headers, proxy=None, window=20):
+        self.name = name
+        self.headers = headers
+        self.proxy = proxy
+        self.outcomes = deque(maxlen=window)  # True = success, False = blocked or failed
+        self.consecutive_blocks = 0
+        self.consecutive_errors = 0
+        self.cooling_until = 0.0
+
+    @property
+    def proxies(self):
+        if not self.proxy:
+            return None
+        return {'http': self.proxy, 'https': self.proxy}
+
+    @property
+    def health(self):
+        """Smoothed success rate over the recent window (0..1, 0.5 when unused)"""
+        successes = sum(self.outcomes)
+        return (successes + 1) / (len(self.outcomes) + 2)
+
+    def is_cooling(self, now=None):
+        return (now or time.monotonic()) < self.cooling_until
+
+    def __repr__(self):
+        return f"RequestIdentity({self.name!r}, health={self.health:.2f})"
+
+
+class IdentityPool:
+    """Health-weighted rotation over request identities.
+
+    Captcha'd identities cool off for `cool_off` seconds,
+    doubling per consecutive block up to `max_cool_off`. Connection errors
+    (a dead or refusing proxy) count against health too and cool off for
+    `error_cool_off` seconds, doubling up to `cool_off`. Selection among the
+    rest is random, weighted by health squared so burned identities fade out
+    quickly but can still recover.
+    """
+
+    def __init__(self, identities, cool_off=120, max_cool_off=3600, error_cool_off=10):
+        if not identities:
+            raise ValueError("IdentityPool needs at least one identity")
+        self.identities = list(identities)
+        self.cool_off = cool_off
+        self.max_cool_off = max_cool_off
+        self.error_cool_off = error_cool_off
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_defaults(cls, proxies=None, header_sets=None, **kwargs):
+        """Build a pool from every combination of header set and proxy"""
+        header_sets = header_sets or DEFAULT_HEADER_SETS
+        proxies = [p for p in (proxies or []) if p] or [None]
+        identities = []
+        for p_index, proxy in enumerate(proxies):
+            for h_index, headers in enumerate(header_sets):
+                name = f"h{h_index}" + (f"-p{p_index}" if proxy else "")
+                identities.append(RequestIdentity(name, headers, proxy))
+        return cls(identities, **kwargs)
+
+    def choose(self):
+        """Pick an identity that isn't cooling off, or None if all are"""
+        now = time.monotonic()
+        with self._lock:
+            available = [i for i in self.identities if not i.is_cooling(now)]
+            if not available:
+                return None
+            weights = [i.health ** 2 for i in available]
+            return random.choices(available, weights=weights, k=1)[0]
+
+    def time_until_available(self):
+        """Seconds until at least one identity has finished cooling off"""
+        now = time.monotonic()
+        with self._lock:
+            return max(0.0, min(i.cooling_until for i in self.identities) - now)
+
+    def report(self, identity, kind):
+        """Feed a classified response back into the identity's health"""
+        with self._lock:
+            if kind in (OK, NOT_FOUND):
+                identity.outcomes.append(True)
+                identity.consecutive_blocks = 0
+                identity.consecutive_errors = 0
+            elif kind == CAPTCHA:
+                identity.outcomes.append(False)
+                identity.consecutive_blocks += 1
+                delay = min(self.max_cool_off,
+                            self.cool_off * 2 ** (identity.consecutive_blocks - 1))
+                identity.cooling_until = time.monotonic() + delay
+            elif kind == ERROR:
+                identity.outcomes.append(False)
+                identity.consecutive_errors += 1
+                delay = min(self.cool_off,
+                            self.error_cool_off * 2 ** (identity.consecutive_errors - 1))
+                identity.cooling_until = time.monotonic() + delay
+            # THROTTLED is about the host, which the breaker and rate limiter
+            # already handle; cooling identities for it would stall the crawl
+
+    def summary(self):
+        """Health snapshot of every identity, for logging"""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    'name': i.name,
+                    'health': round(i.health, 2),
+                    'cooling_for': round(max(0.0, i.cooling_until - now), 1),
+                    'proxy': bool(i.proxy),
+                }
+                for i in self.identities
+            ]
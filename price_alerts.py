@@ -0,0 +1,201 @@
+import threading
+import time
+from bisect import bisect_left
+
+from deal_dataset import to_dataset_record
+from product_index import parse_query, tokenize
+
+
+class WatchRule:
+    """One user's standing alert: products whose title has every term token and meet the limits"""
+
+    def __init__(self, user_id, rule_id, term, max_price=None, min_discount=0.0, min_rating=0.0):
+        self.user_id = user_id
+        self.rule_id = rule_id
+        self.term = term
+        self.max_price = max_price
+        self.min_discount = min_discount
+        self.min_rating = min_rating
+        self.tokens = frozenset(tokenize(term))
+
+    @classmethod
+    def from_query(cls, user_id, rule_id, query):
+        """Rule from free text such as 'gaming laptop under 60k 25% off 4+ stars'"""
+        text, ranges = parse_query(query)
+        return cls(
+            user_id, rule_id, text,
+            max_price=ranges.get('price', (None, None))[1],
+            min_discount=ranges.get('discount', (0.0, None))[0],
+            min_rating=ranges.get('rating', (0.0, None))[0],
+        )
+
+    def describe(self):
+        limits = []
+        if self.max_price is not None:
+            limits.append(f"under ₹{self.max_price:,.0f}")
+        if self.min_discount:
+            limits.append(f"{self.min_discount:.0f}%+ off")
+        if self.min_rating:
+            limits.append(f"{self.min_rating:g}+ stars")
+        return ' '.join([self.term] + limits)
+
+    def to_dict(self):
+        return {
+            'rule_id': self.rule_id,
+            'term': self.term,
+            'max_price': self.max_price,
+            'min_discount': self.min_discount,
+            'min_rating': self.min_rating,
+        }
+
+    @classmethod
+    def from_dict(cls, user_id, data):
+        return cls(user_id, data['rule_id'], data['term'], data['max_price'],
+                   data['min_discount'], data['min_rating'])
+
+
+class PriceAlertIndex:
+    """Matches scraped products against every user's watch rules without scanning them all.
+
+    Each rule is filed under one anchor token of its term (the one with the
+    fewest rules at the time), and each anchor bucket keeps its rules sorted
+    by max price. A product only looks at the buckets of its own title
+    tokens, and within a bucket bisects past every rule whose max price is
+    below the product's price; the remaining rules are checked for their
+    other tokens, discount and rating. Matches come back grouped per user,
+    and a product is only sent to a user again if its price has dropped.
+
+    Bucket lists are never changed in place: add_rules and remove_rule build
+    a new list and swap it in, so match can read them without taking the
+    lock the bot's command handlers use.
+    """
+
+    def __init__(self, max_matches_per_user=10, renotify_after=24 * 3600):
+        self.max_matches_per_user = max_matches_per_user
+        self.renotify_after = renotify_after
+        self.rules = {}     # (user id, rule id) -> WatchRule
+        self.buckets = {}   # anchor token -> sorted [(max price, user id, rule id, rule)]
+        self.anchors = {}   # (user id, rule id) -> anchor token
+        self.notified = {}  # (user id, url) -> (price, notified at)
+        self._lock = threading.Lock()        # rule changes
+        self._match_lock = threading.Lock()  # one match at a time, so `notified` stays consistent
+
+    def __len__(self):
+        return len(self.rules)
+
+    def add_rule(self, rule):
+        self.add_rules([rule])
+
+    def add_rules(self, rules):
+        """Index many rules at once, sorting each touched bucket a single time.
+
+        Loading saved rules one add_rule at a time copies a bucket per rule,
+        which is quadratic in the size of the busiest bucket.
+        """
+        rules = {(rule.user_id, rule.rule_id): rule for rule in rules}  # the last one for a key wins
+        if not all(rule.tokens for rule in rules.values()):
+            raise ValueError("A watch rule needs at least one search term")
+        with self._lock:
+            for key in rules.keys() & self.rules.keys():
+                self._remove(key)
+            added = {}  # anchor token -> new bucket entries
+            for key, rule in rules.items():
+                anchor = min(rule.tokens, key=lambda t: (len(self.buckets.get(t, ())) + len(added.get(t, ())), t))
+                price = float('inf') if rule.max_price is None else rule.max_price
+                added.setdefault(anchor, []).append((price, rule.user_id, rule.rule_id, rule))
+                self.rules[key] = rule
+                self.anchors[key] = anchor
+            for anchor, entries in added.items():
+                # (user id, rule id) is unique, so the sort never compares rules
+                self.buckets[anchor] = sorted([*self.buckets.get(anchor, ()), *entries])
+
+    def remove_rule(self, user_id, rule_id):
+        """Drop a rule; returns False if it did not exist"""
+        with self._lock:
+            if (user_id, rule_id) not in self.rules:
+                return False
+            self._remove((user_id, rule_id))
+            return True
+
+    def _remove(self, key):
+        rule = self.rules.pop(key)
+        anchor = self.anchors.pop(key)
+        bucket = self.buckets[anchor]
+        price = float('inf') if rule.max_price is None else rule.max_price
+        position = bisect_left(bucket, (price,) + key)
+        if position < len(bucket) and bucket[position][:3] == (price,) + key:
+            bucket = bucket[:position] + bucket[position + 1:]
+        if bucket:
+            self.buckets[anchor] = bucket
+        else:
+            del self.buckets[anchor]
+
+    def user_rules(self, user_id):
+        with self._lock:
+            return sorted((r for (u, _), r in self.rules.items() if u == user_id),
+                          key=lambda r: r.rule_id)
+
+    def match(self, products):
+        """{user id: [(rule, record), ...]} for the products that meet someone's rules, best discount first"""
+        now = time.time()
+        candidates = []
+        for product in products:
+            record = to_dataset_record(product, None)
+            url = record['affiliate_url'] or record['original_url']
+            if not record['current_price'] or not url or not record['title']:
+                continue
+            record['url'] = url
+            candidates.append(record)
+        # Best discount first: once a user has max_matches_per_user matches no
+        # later product can beat them, so their rules are skipped from then on
+        candidates.sort(key=lambda r: r['discount_percent'], reverse=True)
+
+        with self._match_lock:
+            batches = {}
+            full_users = set()
+            exhausted = {}  # token -> bucket whose users are all full
+            for record in candidates:
+                price = record['current_price']
+                discount = record['discount_percent']
+                rating = record['rating'] or 0.0
+                title_tokens = set(tokenize(record['title']))
+
+                matched_users = set()
+                for token in title_tokens:
+                    bucket = self.buckets.get(token)
+                    if not bucket or exhausted.get(token) is bucket:
+                        continue
+                    start = bisect_left(bucket, (price,))
+                    live = False
+                    for position in range(start, len(bucket)):
+                        _, user_id, _, rule = bucket[position]
+                        if user_id in full_users:
+                            continue
+                        live = True
+                        if (user_id in matched_users or discount < rule.min_discount
+                                or rating < rule.min_rating or not rule.tokens <= title_tokens):
+                            continue
+                        matched_users.add(user_id)
+                        if self._already_notified(user_id, record['url'], price, now):
+                            continue
+                        matches = batches.setdefault(user_id, [])
+                        matches.append((rule, record))
+                        if len(matches) >= self.max_matches_per_user:
+                            full_users.add(user_id)
+                    if not start and not live:
+                        exhausted[token] = bucket
+
+            for user_id, matches in batches.items():
+                for _, record in matches:
+                    self.notified[(user_id, record['url'])] = (record['current_price'], now)
+            self._expire_notified(now)
+        return batches
+
+    def _already_notified(self, user_id, url, price, now):
+        previous = self.notified.get((user_id, url))
+        return previous is not None and price >= previous[0] and now - previous[1] < self.renotify_after
+
+    def _expire_notified(self, now):
+        expired = [key for key, (_, at) in self.notified.items() if now - at >= self.renotify_after]
+        for key in expired:
+            del self.notified[key]
@@ -0,0 +1,261 @@
+import heapq
+import math
+import re
+import threading
+from bisect import bisect_left, bisect_right, insort
+
+from deal_dataset import to_dataset_record
+
+STOPWORDS = {
+    'a', 'an', 'and', 'the', 'of', 'for', 'with', 'in', 'on', 'to', 'by', 'from',
+    'at', 'or', 'is', 'new', 'latest', 'edition', 'pack', 'me', 'show', 'find',
+    'best', 'deals', 'deal', 'cheap', 'rs', 'inr',
+}
+
+# Common listing vocabulary folded onto one token so queries and titles meet
+SYNONYMS = {
+    'mobile': 'phone', 'mobiles': 'phone', 'smartphone': 'phone', 'smartphones': 'phone',
+    'cellphone': 'phone', 'earbuds': 'earphone', 'earphones': 'earphone',
+    'headphones': 'headphone', 'tv': 'television', 'televisions': 'television',
+    'notebook': 'laptop', 'fridge': 'refrigerator', 'ac': 'airconditioner',
+    'inches': 'inch',
+}
+
+# Units written as "8 GB", "15.6 inch", '15.6"' become one token: 8gb, 15.6inch
+UNIT_PATTERN = re.compile(
+    r'(\d+(?:\.\d+)?)\s*(?:(gb|tb|mb|mah|inch|inches|hz|w|mp|cm|mm|l|kg|g|ton|star)\b|(")|(″))',
+    re.IGNORECASE
+)
+TOKEN_PATTERN = re.compile(r'\d+(?:\.\d+)?[a-z]*|[a-z][a-z0-9]*')
+
+
+def tokenize(text):
+    """Split a product title or query into normalized search tokens"""
+    text = text.lower().replace('₹', ' ')
+    text = UNIT_PATTERN.sub(
+        lambda m: m.group(1) + (SYNONYMS.get(m.group(2), m.group(2)) if m.group(2) else 'inch') + ' ',
+        text
+    )
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text):
+        if token in STOPWORDS:
+            continue
+        token = SYNONYMS.get(token, token)
+        # Crude plural folding: laptops -> laptop, but keep "glass", "pro"
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss') and token.isalpha():
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def _parse_amount(number, suffix):
+    value = float(number.replace(',', ''))
+    suffix = (suffix or '').lower()
+    if suffix == 'k':
+        value *= 1000
+    elif suffix in ('l', 'lakh', 'lac'):
+        value *= 100000
+    return value
+
+
+AMOUNT = r'(?:rs\.?|₹|inr)?\s*(\d[\d,]*(?:\.\d+)?)\s*(k|lakh|lac|l)?\b'
+QUERY_RANGES = [
+    (re.compile(r'\bbetween\s+' + AMOUNT + r'\s+(?:and|to|-)\s+' + AMOUNT, re.IGNORECASE), 'between'),
+    (re.compile(r'\b(?:under|below|within|upto|up to|less than|max|<)\s*' + AMOUNT, re.IGNORECASE), 'max'),
+    (re.compile(r'\b(?:above|over|more than|min|>)\s*' + AMOUNT, re.IGNORECASE), 'min'),
+    (re.compile(AMOUNT + r'\s*-\s*' + AMOUNT, re.IGNORECASE), 'between'),
+]
+DISCOUNT_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*%\s*(?:off|discount)?', re.IGNORECASE)
+# "4+ stars", "4.5 stars", "4★", "4 star rating" - but not "5 star" (an appliance energy rating)
+RATING_PATTERN = re.compile(
+    r'(\d(?:\.\d)?)\s*(?:\+\s*(?:stars?|★|rating)|★|(?:stars?\s+)?rating)|(\d\.\d)\s*stars?\b',
+    re.IGNORECASE
+)
+
+
+def _fuse_units(text):
+    """'256 GB' -> '256GB' so sizes are kept as search text, not read as prices"""
+    def fuse(m):
+        if m.group(2) and m.group(2).lower() == 'l':
+            return m.group(0)  # "1.5 l" is more likely lakh than litres in a query
+        return m.group(1) + (m.group(2) or 'inch') + ' '
+    return UNIT_PATTERN.sub(fuse, text)
+
+
+def parse_query(text):
+    """Split an inline query into search text and numeric filters.
+
+    'laptop under 50k 30% off 4+ stars' ->
+    ('laptop', {'price': (None, 50000.0), 'discount': (30.0, None), 'rating': (4.0, None)})
+    """
+    ranges = {}
+
+    match = DISCOUNT_PATTERN.search(text)
+    if match:
+        ranges['discount'] = (float(match.group(1)), None)
+        text = text[:match.start()] + ' ' + text[match.end():]
+
+    match = RATING_PATTERN.search(text)
+    if match:
+        ranges['rating'] = (float(match.group(1) or match.group(2)), None)
+        text = text[:match.start()] + ' ' + text[match.end():]
+
+    text = _fuse_units(text)
+    for pattern, kind in QUERY_RANGES:
+        match = pattern.search(text)
+        if not match:
+            continue
+        groups = match.groups()
+        if kind == 'between':
+            low, high = _parse_amount(*groups[0:2]), _parse_amount(*groups[2:4])
+            if not groups[1] and groups[3] and _parse_amount(groups[0], groups[3]) <= high:
+                low = _parse_amount(groups[0], groups[3])  # "between 1 and 1.5 lakh"
+            ranges['price'] = (min(low, high), max(low, high))
+        elif kind == 'max':
+            ranges['price'] = (None, _parse_amount(*groups))
+        else:
+            ranges['price'] = (_parse_amount(*groups), None)
+        text = text[:match.start()] + ' ' + text[match.end():]
+        break
+
+    return ' '.join(text.split()), ranges
+
+
+class ProductIndex:
+    """In-memory inverted index over scraped products plus sorted numeric indexes.
+
+    Products are keyed by URL, so re-indexing a product from a newer crawl
+    replaces its old entry. Text terms are ANDed (falling back to the best
+    partial matches), numeric filters use bisect over sorted (value, id)
+    lists, and results are ranked with the same deal score the scraper uses.
+    """
+
+    NUMERIC_FIELDS = ['price', 'discount', 'rating']
+
+    def __init__(self, max_products=50000):
+        self.max_products = max_products
+        self.docs = {}        # doc id -> deal dict
+        self.doc_tokens = {}  # doc id -> set of tokens
+        self.url_ids = {}     # url -> doc id
+        self.postings = {}    # token -> set of doc ids
+        self.numeric = {field: [] for field in self.NUMERIC_FIELDS}
+        self._next_id = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add_products(self, products):
+        """Index scraper products (or dataset rows); returns how many were indexed"""
+        added = 0
+        with self._lock:
+            for product in products:
+                record = to_dataset_record(product, None)
+                url = record['affiliate_url'] or record['original_url']
+                if not url or not record['title'] or not record['current_price']:
+                    continue
+                if url in self.url_ids:
+                    self._remove(self.url_ids[url])
+                self._add(url, record)
+                added += 1
+
+            # Oldest products go first when the index is full
+            while len(self.docs) > self.max_products:
+                self._remove(next(iter(self.docs)))
+        return added
+
+    def _add(self, url, record):
+        doc_id = self._next_id
+        self._next_id += 1
+
+        original_price = record['original_price'] or record['current_price']
+        rating = record['rating'] or 0.0
+        deal = {
+            'title': record['title'],
+            'url': url,
+            'current_price': record['current_price'],
+            'original_price': original_price,
+            'discount_percent': record['discount_percent'],
+            'rating': rating,
+            'review_count': record['review_count'],
+            'availability': record['availability'] or 'Available',
+            'prime_eligible': record['prime_eligible'],
+            'savings': original_price - record['current_price'],
+            'deal_score': (record['discount_percent'] * 0.4 + rating * 10 * 0.3 +
+                           math.log1p(record['review_count']) * 0.7),
+        }
+        tokens = set(tokenize(record['title']))
+
+        self.docs[doc_id] = deal
+        self.doc_tokens[doc_id] = tokens
+        self.url_ids[url] = doc_id
+        for token in tokens:
+            self.postings.setdefault(token, set()).add(doc_id)
+        for field, value in self._numeric_values(deal).items():
+            insort(self.numeric[field], (value, doc_id))
+
+    def _remove(self, doc_id):
+        deal = self.docs.pop(doc_id)
+        del self.url_ids[deal['url']]
+        for token in self.doc_tokens.pop(doc_id):
+            ids = self.postings[token]
+            ids.discard(doc_id)
+            if not ids:
+                del self.postings[token]
+        for field, value in self._numeric_values(deal).items():
+            values = self.numeric[field]
+            position = bisect_left(values, (value, doc_id))
+            if position < len(values) and values[position] == (value, doc_id):
+                del values[position]
+
+    @staticmethod
+    def _numeric_values(deal):
+        return {
+            'price': deal['current_price'],
+            'discount': deal['discount_percent'],
+            'rating': deal['rating'],
+        }
+
+    def _range_ids(self, field, low, high):
+        values = self.numeric[field]
+        start = 0 if low is None else bisect_left(values, (low, -1))
+        end = len(values) if high is None else bisect_right(values, (high, float('inf')))
+        return {doc_id for _, doc_id in values[start:end]}
+
+    def search(self, query, limit=10):
+        """Ranked deals for a free-text query such as 'laptop under 50000'"""
+        text, ranges = parse_query(query)
+        tokens = tokenize(text)
+
+        with self._lock:
+            candidates = None
+            if tokens:
+                posting_sets = sorted((self.postings.get(t, set()) for t in set(tokens)), key=len)
+                candidates = set.intersection(*posting_sets) if posting_sets[0] else set()
+                if not candidates:
+                    # No product has every term: take products matching the most terms
+                    counts = {}
+                    for ids in posting_sets:
+                        for doc_id in ids:
+                            counts[doc_id] = counts.get(doc_id, 0) + 1
+                    if counts:
+                        best = max(counts.values())
+                        candidates = {d for d, c in counts.items() if c == best}
+
+            for field, (low, high) in ranges.items():
+                if candidates is not None and len(candidates) < 64:
+                    # Cheaper to check a handful of docs directly
+                    candidates = {
+                        d for d in candidates
+                        if (low is None or self._numeric_values(self.docs[d])[field] >= low)
+                        and (high is None or self._numeric_values(self.docs[d])[field] <= high)
+                    }
+                else:
+                    ids = self._range_ids(field, low, high)
+                    candidates = ids if candidates is None else candidates & ids
+
+            if candidates is None:
+                candidates = self.docs.keys()
+
+            ranked = heapq.nlargest(limit, candidates, key=lambda d: self.docs[d]['deal_score'])
+            return [dict(self.docs[d]) for d in ranked]
@@ -0,0 +1,233 @@
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+from telegram.request import HTTPXRequest
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_active_lock = threading.Lock()
+_active_profiler = None
+
+# Leaf frames of a thread that is waiting rather than working
+IDLE_LEAVES = {'threading.py:wait', 'selectors.py:select', 'queue.py:get', 'thread.py:_worker'}
+
+# Frames that dispatch into a callback, task step or thread target. Only what
+# runs below the innermost one counts towards inclusive time, so entry points
+# like main() and run_polling() don't head every report.
+DISPATCH_FRAMES = {'events.py:_run', 'thread.py:run', 'threading.py:run'}
+
+# Besides the thread that started the profile (the event loop), only the
+# default executor's threads are sampled: that is where asyncio.to_thread
+# runs crawls. Scheduler, RSS-monitor and profiler threads are left out.
+SAMPLED_THREAD_PREFIX = 'asyncio'
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def _is_project_frame(name, project_files):
+    return name.split(':', 1)[0] in project_files
+
+
+def _below_dispatch(frames):
+    """The part of a root-first stack below its innermost dispatch frame"""
+    for position in range(len(frames) - 1, -1, -1):
+        if frames[position] in DISPATCH_FRAMES:
+            return frames[position + 1:]
+    return frames
+
+
+def record_telegram_call(method, seconds):
+    """Attribute an awaited Bot API call to the running profile, if any"""
+    profiler = _active_profiler
+    if profiler is not None:
+        profiler.record_await(method, seconds)
+
+
+class ProfiledRequest(HTTPXRequest):
+    """HTTPXRequest that reports each Bot API call's duration to the running profile.
+
+    Time spent awaiting Telegram never shows up on a thread stack, so the
+    sampler alone cannot say how long a command spent sending messages.
+    """
+
+    async def do_request(self, url, method, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().do_request(url, method, *args, **kwargs)
+        finally:
+            record_telegram_call(url.rsplit('/', 1)[-1], time.perf_counter() - started)
+
+
+class SamplingProfiler:
+    """Samples the stacks of all threads plus tracemalloc for one crawl or command.
+
+    Sampling (rather than cProfile) sees the crawl's worker thread as well as
+    the bot's event loop, and keeps overhead low enough to use in production.
+    Only one profile may run at a time because tracemalloc is process-wide.
+
+    Output, written to `output_dir` on stop():
+      <label>-<time>.folded       collapsed stacks for flamegraph.pl / speedscope
+      <label>-<time>-summary.txt  top-N self/inclusive hotspots and allocations
+    """
+
+    def __init__(self, label, output_dir='profiles', interval=0.005, top_n=25):
+        self.label = label
+        self.output_dir = output_dir
+        self.interval = interval
+        self.top_n = top_n
+        self.stacks = Counter()
+        self.samples = 0
+        self.awaits = {}  # Bot API method -> [calls, total seconds, max seconds]
+        self.started_at = None
+        self.duration = 0.0
+        self.summary = ''
+        self.paths = []
+        self._stop = threading.Event()
+        self._thread = None
+        self._owns_tracemalloc = False
+        self._owner_thread = None
+
+    def start(self):
+        global _active_profiler
+        if not _active_lock.acquire(blocking=False):
+            raise RuntimeError("Another profile is already running")
+        _active_profiler = self
+        self._owner_thread = threading.get_ident()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            self._owns_tracemalloc = True
+        tracemalloc.reset_peak()
+        self.started_at = time.perf_counter()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample_loop, name='profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def _sampled_threads(self):
+        return {
+            t.ident for t in threading.enumerate()
+            if t.ident == self._owner_thread or t.name.startswith(SAMPLED_THREAD_PREFIX)
+        }
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            sampled = self._sampled_threads()
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id not in sampled or _frame_name(frame) in IDLE_LEAVES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def record_await(self, method, seconds):
+        calls = self.awaits.setdefault(method, [0, 0.0, 0.0])
+        calls[0] += 1
+        calls[1] += seconds
+        calls[2] = max(calls[2], seconds)
+
+    def telegram_waits(self):
+        """(method, calls, total seconds, max seconds) for awaited Bot API calls, slowest first"""
+        return sorted(((m, c[0], c[1], c[2]) for m, c in self.awaits.items()),
+                      key=lambda item: item[2], reverse=True)
+
+    def stop(self):
+        """Stop sampling, write the reports and return the summary text"""
+        global _active_profiler
+        _active_profiler = None
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+        try:
+            _, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+        finally:
+            _active_lock.release()
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        base = os.path.join(self.output_dir, f"{self.label}-{stamp}")
+
+        folded_path = f"{base}.folded"
+        with open(folded_path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        self.summary = self._build_summary(peak, snapshot)
+        summary_path = f"{base}-summary.txt"
+        with open(summary_path, 'w') as f:
+            f.write(self.summary)
+
+        self.paths = [folded_path, summary_path]
+        return self.summary
+
+    def project_hotspots(self):
+        """(function, inclusive samples) for this repo's functions, most expensive first"""
+        project_files = {name for name in os.listdir(PROJECT_DIR) if name.endswith('.py')}
+        project_files.discard(os.path.basename(__file__))
+        inclusive = Counter()
+        for stack, count in self.stacks.items():
+            for name in set(_below_dispatch(stack.split(';'))):
+                if _is_project_frame(name, project_files):
+                    inclusive[name] += count
+        return inclusive.most_common(self.top_n)
+
+    def _build_summary(self, peak, snapshot):
+        self_time = Counter()
+        inclusive = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            self_time[frames[-1]] += count
+            for name in set(_below_dispatch(frames)):
+                inclusive[name] += count
+        total = sum(self_time.values()) or 1
+
+        lines = [
+            f"Profile: {self.label}",
+            f"Duration: {self.duration:.2f}s, {self.samples} samples "
+            f"every {self.interval * 1000:.0f}ms of the event loop and executor threads "
+            f"(idle waits dropped)",
+            f"Peak traced memory: {peak / 1024 / 1024:.1f} MiB",
+            "",
+            f"Top {self.top_n} project functions (inclusive):",
+        ]
+        for name, count in self.project_hotspots():
+            lines.append(f"  {count / total * 100:6.1f}%  {name}")
+
+        lines += ["", "Awaited Telegram API calls (not visible in samples):"]
+        for method, calls, total_seconds, max_seconds in self.telegram_waits():
+            lines.append(f"  {total_seconds:8.2f}s  {calls:5d} calls  max {max_seconds:.2f}s  {method}")
+
+        lines += ["", f"Top {self.top_n} functions (self):"]
+        for name, count in self_time.most_common(self.top_n):
+            lines.append(f"  {count / total * 100:6.1f}%  {name}")
+
+        lines += ["", f"Top {self.top_n} functions (inclusive):"]
+        for name, count in inclusive.most_common(self.top_n):
+            lines.append(f"  {count / total * 100:6.1f}%  {name}")
+
+        lines += ["", f"Top {self.top_n} allocation sites:"]
+        for stat in snapshot.statistics('lineno')[:self.top_n]:
+            frame = stat.traceback[0]
+            lines.append(f"  {stat.size / 1024:10.1f} KiB  {stat.count:7d} blocks  "
+                         f"{os.path.basename(frame.filename)}:{frame.lineno}")
+
+        return '\n'.join(lines) + '\n'
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
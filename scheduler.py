@@ -4,6 +4,7 @@ import threading
 import asyncio
 import logging
 from datetime import datetime
+from amazon_scraper import CrawlDedup
 
 # Configure logging for scheduler
 logging.basicConfig(
@@ -86,6 +87,24 @@ class DealScheduler:
         # logger.info("  - Evening deals: 6:00 PM")
         # logger.info("  - Flash deals: Every 2 hours")
     
+    def schedule_view_refresh(self, terms, interval_minutes):
+        """Keep materialized deal views for popular terms fresh"""
+
+        def refresh_views():
+            # One dedup for the whole round so overlapping terms share product fetches
+            dedup = CrawlDedup()
+            for term in terms:
+                try:
+                    logger.info(f"Refreshing deal views - Term: {term}")
+                    self.bot.refresh_deal_views(term, dedup=dedup)
+                except Exception as e:
+                    logger.error(f"Error refreshing deal views for {term}: {e}")
+
+        schedule.every(interval_minutes).minutes.do(refresh_views)
+        # Build the views now instead of waiting a full interval
+        threading.Thread(target=refresh_views, daemon=True).start()
+        logger.info(f"  - Deal views ({', '.join(terms)}): every {interval_minutes} minutes")
+    
     def start_scheduler(self):
         if self.is_running:
             logger.warning("Scheduler already running!")
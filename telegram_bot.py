@@ -1,10 +1,27 @@
 import logging
 import asyncio
-from telegram import Update
-from telegram.ext import Application, CommandHandler, ContextTypes
+from telegram import Update, InlineQueryResultArticle, InputTextMessageContent
+from telegram.ext import Application, CommandHandler, InlineQueryHandler, ContextTypes
 from amazon_scraper import AmazonDealsScraper
+from anytime_crawl import AnytimeCrawl
+from deal_dataset import DealDatasetWriter, load_deals
+from fetch_control import ThrottledFetcher
+from identity_pool import IdentityPool
+from webhook_server import WebhookReceiver, TimedUpdateQueue, LatencyTrackingApplication
+from work_queue import create_work_queue, submit_crawl, wait_for_crawl
+from deal_views import DealViewStore, view_deals_dataframe
+from scheduler import DealScheduler
+from product_index import ProductIndex
+from profiling import SamplingProfiler, ProfiledRequest
+from price_alerts import PriceAlertIndex, WatchRule
+from channel_publisher import ChannelPublisher, load_routes
+from user_settings import get_user_settings, set_user_settings, load_all_user_settings
+from datetime import date, timedelta
 from config import Config
 import time
+import html
+import secrets
+from functools import partial
 
 # Configure logging
 logging.basicConfig(
@@ -17,6 +34,49 @@ class DealsBot:
     def __init__(self, token):
         self.token = token
         self.app = None
+        self.loop = None
+        self.publisher = None
+        self.channel_routes = load_routes(Config.CHANNEL_ROUTES, Config.CHANNEL_ID)
+        self.product_index = ProductIndex(max_products=Config.PRODUCT_INDEX_MAX_PRODUCTS)
+        self.work_queue = None
+        self.deal_views = None
+        self.refine_tasks = set()  # background anytime refinements still running
+        self.price_alerts = PriceAlertIndex(
+            max_matches_per_user=Config.ALERT_MAX_MATCHES,
+            renotify_after=Config.ALERT_RENOTIFY_HOURS * 3600
+        )
+        self.load_watch_rules()
+        if Config.DEAL_VIEW_TERMS:
+            self.deal_views = DealViewStore(
+                path=Config.DEAL_VIEWS_PATH,
+                buckets=[
+                    {
+                        'min_discount': discount,
+                        'min_review_count': Config.MIN_REVIEW_COUNT,
+                        'min_budget': Config.MIN_BUDGET,
+                        'max_budget': Config.MAX_BUDGET,
+                    }
+                    for discount in Config.DEAL_VIEW_DISCOUNT_BUCKETS
+                ],
+                max_age=Config.DEAL_VIEW_MAX_AGE_MINUTES * 60
+            )
+        if Config.CRAWL_MODE == 'distributed':
+            self.work_queue = create_work_queue(
+                Config.WORK_QUEUE_URL, max_attempts=Config.WORK_QUEUE_MAX_ATTEMPTS
+            )
+        # Shared so concurrent /deals crawls back off amazon.in together
+        self.fetcher = ThrottledFetcher(
+            initial_rate=Config.FETCH_INITIAL_RATE,
+            max_rate=Config.FETCH_MAX_RATE,
+            max_retries=Config.FETCH_MAX_RETRIES,
+            failure_threshold=Config.BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=Config.BREAKER_RESET_TIMEOUT,
+            max_wait=Config.BREAKER_MAX_WAIT,
+            identity_pool=IdentityPool.from_defaults(
+                proxies=Config.IDENTITY_PROXIES,
+                cool_off=Config.IDENTITY_COOL_OFF
+            )
+        )
         
     def parse_args_to_dict(self, args):
         """Parse command arguments into a dictionary"""
@@ -27,6 +87,32 @@ class DealsBot:
                 filter_dict[key.strip()] = value.strip()
         return filter_dict
     
+    def load_watch_rules(self):
+        """Index every user's saved /watch rules"""
+        self.price_alerts.add_rules(
+            WatchRule.from_dict(int(user_id), data)
+            for user_id, settings in load_all_user_settings().items()
+            for data in settings.get('watches', [])
+        )
+        if len(self.price_alerts):
+            logger.info(f"Loaded {len(self.price_alerts)} watch rules")
+    
+    def parse_deadline(self, value):
+        """Seconds for a deadline like '20s', '2m' or '45'; None if unset or invalid"""
+        if not value:
+            return Config.DEALS_DEFAULT_DEADLINE or None
+        value = value.strip().lower()
+        multiplier = 1
+        if value.endswith('m'):
+            value, multiplier = value[:-1], 60
+        elif value.endswith('s'):
+            value = value[:-1]
+        try:
+            seconds = float(value) * multiplier
+        except ValueError:
+            return Config.DEALS_DEFAULT_DEADLINE or None
+        return seconds if seconds > 0 else None
+    
     def create_scraper_with_filters(self, filter_dict):
         """Create scraper instance with custom filters"""
         defaults = {
@@ -62,6 +148,15 @@ class DealsBot:
         except ValueError:
             max_budget = defaults['max_budget']
         
+        bounded = Config.CRAWL_BOUNDED_MEMORY or max_pages >= Config.CRAWL_BOUNDED_MIN_PAGES
+        
+        dataset_writer = None
+        if Config.DATASET_DIR:
+            dataset_writer = DealDatasetWriter(
+                Config.DATASET_DIR, search_term,
+                row_group_size=Config.DATASET_ROW_GROUP_SIZE
+            )
+        
         scraper = AmazonDealsScraper(
             search_term=search_term,
             max_pages=max_pages,
@@ -69,7 +164,11 @@ class DealsBot:
             min_review_count=min_review_count,
             min_budget=min_budget,
             max_budget=max_budget,
-            affiliate_tag=Config.AFFILIATE_TAG
+            affiliate_tag=Config.AFFILIATE_TAG,
+            dataset_writer=dataset_writer,
+            fetcher=self.fetcher,
+            spill_threshold=Config.CRAWL_SPILL_THRESHOLD if bounded else None,
+            max_body_bytes=Config.CRAWL_MAX_BODY_BYTES if bounded else None
         )
         
         return scraper
@@ -78,11 +177,19 @@ class DealsBot:
         """Handle deals command with NO timeouts - take as much time as needed"""
         try:
             start_time = time.time()
-            await update.message.reply_text("🔍 Starting comprehensive deal search... This will take as long as needed!")
-            
             filters = self.parse_args_to_dict(context.args)
             scraper = self.create_scraper_with_filters(filters)
             
+            if await self.answer_from_view(update, scraper, start_time):
+                return
+            
+            deadline = self.parse_deadline(filters.get('deadline'))
+            if deadline:
+                await self.anytime_deals(update, scraper, start_time + deadline, start_time)
+                return
+            
+            await update.message.reply_text("🔍 Starting comprehensive deal search... This will take as long as needed!")
+            
             filter_info = f"""
 🔧 Search Configuration:
 • Term: {scraper.search_term}
@@ -100,10 +207,14 @@ class DealsBot:
                 await update.message.reply_text("📦 Phase 1: Product Discovery (No time limit)")
                 
                 # Run without any timeout restrictions
-                products = await asyncio.to_thread(scraper.scrape_search_results)
+                products = await asyncio.to_thread(self.crawl, scraper)
                 
                 search_duration = time.time() - start_time
                 await update.message.reply_text(f"✅ Phase 1 Complete: Found {len(products)} products in {search_duration:.1f}s")
+                if scraper.last_crawl_stats:
+                    logger.info(f"Crawl for '{scraper.search_term}': peak RSS "
+                                f"{scraper.last_crawl_stats['peak_rss_mb']:.1f} MiB, "
+                                f"{scraper.last_crawl_stats['spilled']} products spilled")
                 
             except Exception as e:
                 logger.error(f"Scraping error: {str(e)}")
@@ -130,6 +241,10 @@ class DealsBot:
                 deals = self.basic_filter_deals(products, scraper)
                 await self.process_and_send_deals(update, deals, scraper.search_term, start_time)
                 return
+            finally:
+                # A spilled crawl holds a temp file open until it is closed
+                if hasattr(products, 'close'):
+                    products.close()
             
             if deals_df.empty:
                 await update.message.reply_text("❌ No deals match your criteria. Consider lowering requirements.")
@@ -143,7 +258,379 @@ class DealsBot:
             logger.error(f"Main error in deals command: {str(e)}")
             await update.message.reply_text(f"❌ System error: {str(e)}")
     
-    async def process_and_send_deals(self, update, deals, search_term, start_time):
+    async def answer_from_view(self, update, scraper, start_time):
+        """Reply from a materialized deal view if one covers the query"""
+        if self.deal_views is None:
+            return False
+        
+        view = self.deal_views.lookup(
+            scraper.search_term, scraper.min_discount, scraper.min_review_count,
+            scraper.min_budget, scraper.max_budget, scraper.max_pages
+        )
+        if view is None:
+            return False
+        
+        deals_df = view_deals_dataframe(
+            view, scraper.min_discount, scraper.min_review_count,
+            scraper.min_budget, scraper.max_budget
+        )
+        if deals_df.empty:
+            return False
+        
+        age_minutes = view.age / 60
+        await update.message.reply_text(
+            f"⚡ Instant results for '{scraper.search_term}' "
+            f"(updated {age_minutes:.0f} min ago, view v{view.version})"
+        )
+        deals = self.convert_dataframe_to_deals(deals_df, scraper)
+        await self.process_and_send_deals(update, deals, scraper.search_term, start_time,
+                                          post_to_channel=False)
+        return True
+    
+    async def anytime_deals(self, update, scraper, answer_by, start_time):
+        """Answer by `answer_by` (a time.time()) with the best deals found so far, then refine"""
+        await update.message.reply_text(
+            f"⏱️ Searching '{scraper.search_term}' for up to {answer_by - start_time:.0f}s..."
+        )
+        crawl = AnytimeCrawl(scraper)
+        # Leave a moment for ranking and replying once the crawl stops
+        stop_at = time.monotonic() + (answer_by - time.time()) - 1.0
+        try:
+            products = await asyncio.to_thread(crawl.run_until, stop_at)
+            deals = await asyncio.to_thread(self.rank_anytime_deals, scraper, products)
+        except Exception as e:
+            logger.error(f"Anytime search error: {str(e)}")
+            await update.message.reply_text(f"❌ Search error: {str(e)}")
+            await asyncio.to_thread(self.finish_anytime_crawl, crawl, scraper)
+            return
+        
+        refining = Config.ANYTIME_REFINE and not crawl.finished
+        message = await update.message.reply_text(
+            self.format_anytime_summary(scraper, deals, crawl, start_time, refining),
+            parse_mode='HTML', disable_web_page_preview=True
+        )
+        
+        if not refining:
+            await asyncio.to_thread(self.finish_anytime_crawl, crawl, scraper)
+            return
+        task = asyncio.create_task(self.refine_anytime_deals(message, scraper, crawl, deals, start_time))
+        self.refine_tasks.add(task)
+        task.add_done_callback(self.refine_tasks.discard)
+    
+    async def refine_anytime_deals(self, message, scraper, crawl, deals, start_time):
+        """Keep crawling after the first answer and edit it if the top deals improve"""
+        try:
+            products = await asyncio.to_thread(
+                crawl.run_until, time.monotonic() + Config.ANYTIME_REFINE_SECONDS
+            )
+            refined = await asyncio.to_thread(self.rank_anytime_deals, scraper, products)
+            top = [(d['url'], d['current_price']) for d in deals[:5]]
+            if [(d['url'], d['current_price']) for d in refined[:5]] != top:
+                await message.edit_text(
+                    self.format_anytime_summary(scraper, refined, crawl, start_time, False),
+                    parse_mode='HTML', disable_web_page_preview=True
+                )
+            logger.info(f"Anytime refinement for '{scraper.search_term}' done: {crawl.coverage()}")
+        except Exception as e:
+            logger.error(f"Anytime refinement error: {str(e)}")
+        finally:
+            await asyncio.to_thread(self.finish_anytime_crawl, crawl, scraper)
+    
+    def rank_anytime_deals(self, scraper, products):
+        """Deals from a (possibly partial) crawl, best first"""
+        if not products:
+            return []
+        deals_df = scraper.filter_best_deals(products)
+        if deals_df.empty:
+            return []
+        return self.convert_dataframe_to_deals(deals_df, scraper)
+    
+    def finish_anytime_crawl(self, crawl, scraper):
+        """Index and export whatever the anytime crawl collected"""
+        self.product_index.add_products(crawl.products)
+        self.notify_watchers(crawl.products)
+        if scraper.dataset_writer is not None:
+            with scraper.dataset_writer as writer:
+                writer.write_products(crawl.products)
+    
+    def format_anytime_summary(self, scraper, deals, crawl, start_time, refining):
+        """One HTML message with the top 5 deals and how much of the search was covered"""
+        coverage = crawl.coverage()
+        if refining:
+            status = "still searching, this message will update if better deals turn up"
+        elif coverage['finished']:
+            status = "search complete"
+        else:
+            status = "partial results"
+        lines = [
+            f"⏱️ <b>Best deals for '{html.escape(scraper.search_term)}' "
+            f"after {time.time() - start_time:.0f}s</b>",
+            f"Searched {coverage['pages_done']}/{coverage['max_pages']} pages, checked "
+            f"{coverage['candidates_fetched']} of {coverage['candidates_found']} products ({status})",
+            "",
+        ]
+        if not deals:
+            lines.append("❌ No deals match your criteria yet.")
+        for i, deal in enumerate(deals[:5], 1):
+            lines.append(
+                f"{i}. <a href=\"{html.escape(deal['url'])}\">{html.escape(deal['title'][:80])}</a>\n"
+                f"   ₹{deal['current_price']:,.0f} ({deal['discount_percent']:.0f}% off, "
+                f"{deal['rating']}/5, {deal['review_count']} reviews)"
+            )
+        return "\n".join(lines)
+    
+    def refresh_deal_views(self, term, dedup=None):
+        """Crawl a popular term and rebuild its deal views (runs in the scheduler thread)"""
+        scraper = self.create_scraper_with_filters({'search_term': term})
+        scraper.shared_dedup = dedup
+        products = self.crawl(scraper)
+        # update() re-filters with each bucket's thresholds on this scraper
+        views = self.deal_views.update(scraper, products)
+        if hasattr(products, 'close'):
+            products.close()
+        logger.info(f"Deal views for '{term}' refreshed: "
+                    + ", ".join(f"{v.thresholds['min_discount']:.0f}%: {len(v.deals)} deals" for v in views))
+    
+    def profiled(self, handler, label):
+        """Wrap a command handler so each call is profiled to Config.PROFILE_DIR"""
+        async def wrapper(update, context):
+            await self.run_profiled(label, partial(handler, update, context))
+        return wrapper
+    
+    async def run_profiled(self, label, make_coroutine, skip_if_busy=False):
+        """Await make_coroutine() under the sampling profiler and return the profiler.
+        
+        If another profile is running, the coroutine runs unprofiled (or with
+        skip_if_busy is never created) and None is returned.
+        """
+        try:
+            profiler = SamplingProfiler(label, Config.PROFILE_DIR).start()
+        except RuntimeError as e:
+            logger.warning(f"Not profiling {label}: {str(e)}")
+            if not skip_if_busy:
+                await make_coroutine()
+            return None
+        
+        try:
+            await make_coroutine()
+        finally:
+            await asyncio.to_thread(profiler.stop)
+            logger.info(f"Profile for {label} written to {', '.join(profiler.paths)}")
+        return profiler
+    
+    async def profile_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Admin command: /profile deals|crawl [filters] runs one command under the profiler"""
+        if update.effective_user.id not in Config.ADMIN_USER_IDS:
+            await update.message.reply_text("❌ /profile is only available to admins.")
+            return
+        
+        target = context.args[0] if context.args else 'deals'
+        filters = self.parse_args_to_dict(context.args[1:])
+        
+        if target == 'deals':
+            context.args = context.args[1:]
+            run_target = partial(self.deals_command, update, context)
+        elif target == 'crawl':
+            scraper = self.create_scraper_with_filters(filters)
+            run_target = partial(asyncio.to_thread, self.crawl, scraper)
+        else:
+            await update.message.reply_text("Usage: /profile deals|crawl [search_term=VALUE ...]")
+            return
+        
+        async def profiled_target():
+            await update.message.reply_text(f"⏱️ Profiling /{target}...")
+            await run_target()
+        
+        # A busy profiler answers straight away instead of running the target unprofiled
+        profiler = await self.run_profiled(f"profile-{target}", profiled_target, skip_if_busy=True)
+        if profiler is None:
+            await update.message.reply_text("⚠️ Another profile is already running.")
+            return
+        
+        hotspots = "\n".join(
+            f"• {name}: {count * profiler.duration / max(profiler.samples, 1):.1f}s"
+            for name, count in profiler.project_hotspots()[:10]
+        )
+        telegram_waits = "\n".join(
+            f"• {method}: {total_seconds:.1f}s over {calls} calls"
+            for method, calls, total_seconds, _ in profiler.telegram_waits()[:5]
+        ) or "• none"
+        await update.message.reply_text(
+            f"📈 Profile done in {profiler.duration:.1f}s\n\n"
+            f"Top bot/scraper functions (sampled thread-seconds):\n{hotspots}\n\n"
+            f"Awaiting Telegram:\n{telegram_waits}\n\n"
+            f"Files:\n" + "\n".join(profiler.paths)
+        )
+    
+    async def channels_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Admin command: per-channel delivery latency and failure stats"""
+        if update.effective_user.id not in Config.ADMIN_USER_IDS:
+            await update.message.reply_text("❌ /channels is only available to admins.")
+            return
+        if not self.channel_routes:
+            await update.message.reply_text("No channels configured.")
+            return
+        
+        lines = ["📺 Channel delivery stats:"]
+        for route in self.channel_routes:
+            stats = self.publisher.stats[route.name]
+            lines.append(
+                f"• {route.name} ({route.chat_id}): {stats.posts} posts, {stats.messages_sent} sent, "
+                f"{stats.messages_failed} failed, {stats.retries} retries, "
+                f"avg send {stats.average_send_seconds * 1000:.0f}ms, "
+                f"last post {stats.last_post_seconds:.1f}s, max {stats.max_post_seconds:.1f}s"
+                + (f"\n  last error: {stats.last_error}" if stats.last_error else "")
+            )
+        await update.message.reply_text("\n".join(lines))
+    
+    def crawl(self, scraper):
+        """Run a crawl locally, or through the worker queue in distributed mode"""
+        if self.work_queue is None:
+            products = scraper.scrape_search_results()
+            self.product_index.add_products(products)
+            self.notify_watchers(products)
+            return products
+        
+        job_id = submit_crawl(self.work_queue, scraper)
+        logger.info(f"Submitted crawl {job_id} for '{scraper.search_term}' to the work queue")
+        try:
+            products = wait_for_crawl(self.work_queue, job_id, idle_timeout=Config.WORK_QUEUE_JOB_TIMEOUT)
+        finally:
+            self.work_queue.delete_job(job_id)
+        
+        if scraper.dataset_writer is not None and products:
+            with scraper.dataset_writer as writer:
+                writer.write_products(products)
+        self.product_index.add_products(products)
+        self.notify_watchers(products)
+        return products
+    
+    def seed_product_index(self):
+        """Load recent crawls from the deal dataset into the search index"""
+        if not Config.DATASET_DIR or not Config.PRODUCT_INDEX_SEED_DAYS:
+            return
+        try:
+            df = load_deals(Config.DATASET_DIR,
+                            start_date=date.today() - timedelta(days=Config.PRODUCT_INDEX_SEED_DAYS))
+            rows = df.astype(object).where(df.notna(), None).to_dict('records')
+            added = self.product_index.add_products(rows)
+            logger.info(f"Product index seeded with {added} products from the deal dataset")
+        except Exception as e:
+            logger.error(f"Product index seeding error: {str(e)}")
+    
+    def notify_watchers(self, products):
+        """Match a crawl against all watch rules and queue one message per user (called from crawl threads)"""
+        if not len(self.price_alerts) or self.loop is None:
+            return
+        started = time.perf_counter()
+        batches = self.price_alerts.match(products)
+        logger.info(f"Matched {len(products)} products against {len(self.price_alerts)} watch rules "
+                    f"in {(time.perf_counter() - started) * 1000:.0f}ms: {len(batches)} users to notify")
+        if batches:
+            asyncio.run_coroutine_threadsafe(self.send_watch_alerts(batches), self.loop)
+    
+    async def send_watch_alerts(self, batches):
+        """Send each user their batched watch matches"""
+        for user_id, matches in batches.items():
+            await self.publisher.global_limiter.wait()  # shared with channel posts
+            try:
+                await self.app.bot.send_message(
+                    chat_id=user_id, text=self.format_watch_alert(matches),
+                    parse_mode='HTML', disable_web_page_preview=True
+                )
+            except Exception as e:
+                logger.warning(f"Watch alert to {user_id} failed: {str(e)}")
+    
+    def format_watch_alert(self, matches):
+        lines = [f"🔔 <b>{len(matches)} new deal{'s' if len(matches) != 1 else ''} for your watches</b>", ""]
+        for rule, record in matches:
+            rating = f", {record['rating']}/5" if record['rating'] else ""
+            lines.append(
+                f"• <a href=\"{html.escape(record['url'])}\">{html.escape(record['title'][:80])}</a>\n"
+                f"   ₹{record['current_price']:,.0f} ({record['discount_percent']:.0f}% off{rating}) "
+                f"— watch #{rule.rule_id}"
+            )
+        return "\n".join(lines)
+    
+    async def watch_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """/watch gaming laptop under 60k 25% off 4+ stars"""
+        query = ' '.join(context.args).strip()
+        if not query:
+            await update.message.reply_text("Usage: /watch TERM [under PRICE] [N% off] [N+ stars]\n"
+                                            "e.g. /watch gaming laptop under 60k 25% off")
+            return
+        
+        user_id = update.effective_user.id
+        if len(self.price_alerts.user_rules(user_id)) >= Config.ALERT_MAX_RULES_PER_USER:
+            await update.message.reply_text(
+                f"❌ You already have {Config.ALERT_MAX_RULES_PER_USER} watches. Remove one with /unwatch ID."
+            )
+            return
+        
+        settings = get_user_settings(user_id)
+        rule = WatchRule.from_query(user_id, settings.get('next_watch_id', 1), query)
+        try:
+            self.price_alerts.add_rule(rule)
+        except ValueError as e:
+            await update.message.reply_text(f"❌ {str(e)}")
+            return
+        
+        settings['watches'] = settings.get('watches', []) + [rule.to_dict()]
+        settings['next_watch_id'] = rule.rule_id + 1
+        set_user_settings(user_id, settings)
+        await update.message.reply_text(f"👀 Watch #{rule.rule_id} added: {rule.describe()}\n"
+                                        "You'll get a message when a crawl finds a match.")
+    
+    async def unwatch_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """/unwatch ID removes one of the user's watches"""
+        try:
+            rule_id = int(context.args[0].lstrip('#'))
+        except (IndexError, ValueError):
+            await update.message.reply_text("Usage: /unwatch ID (see /watches)")
+            return
+        
+        user_id = update.effective_user.id
+        if not self.price_alerts.remove_rule(user_id, rule_id):
+            await update.message.reply_text(f"❌ No watch #{rule_id}. See /watches.")
+            return
+        settings = get_user_settings(user_id)
+        settings['watches'] = [w for w in settings.get('watches', []) if w['rule_id'] != rule_id]
+        set_user_settings(user_id, settings)
+        await update.message.reply_text(f"🗑️ Watch #{rule_id} removed.")
+    
+    async def watches_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """/watches lists the user's watches"""
+        rules = self.price_alerts.user_rules(update.effective_user.id)
+        if not rules:
+            await update.message.reply_text("You have no watches. Add one with /watch TERM [under PRICE].")
+            return
+        await update.message.reply_text(
+            "👀 Your watches:\n" + "\n".join(f"#{r.rule_id}: {r.describe()}" for r in rules)
+        )
+    
+    async def inline_query(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Answer inline queries such as '@bot laptop under 50000' from the product index"""
+        query = update.inline_query.query.strip()
+        if not query:
+            return
+        
+        deals = self.product_index.search(query, limit=10)
+        results = [
+            InlineQueryResultArticle(
+                id=str(abs(hash(deal['url']))),
+                title=deal['title'][:100],
+                description=(f"₹{deal['current_price']:,.0f} • {deal['discount_percent']:.0f}% off"
+                             f" • ⭐ {deal['rating']}/5 ({deal['review_count']} reviews)"),
+                url=deal['url'],
+                input_message_content=InputTextMessageContent(
+                    self.format_deal_message(deal, i), parse_mode='HTML'
+                )
+            )
+            for i, deal in enumerate(deals, 1)
+        ]
+        await update.inline_query.answer(results, cache_time=60)
+    
+    async def process_and_send_deals(self, update, deals, search_term, start_time, post_to_channel=True):
         """Process and send deals without any timeouts"""
         try:
             total_duration = time.time() - start_time
@@ -158,10 +645,18 @@ class DealsBot:
                 await asyncio.sleep(0.5)
             
             # Channel posting without timeouts
-            if Config.CHANNEL_ID:
+            if self.channel_routes and post_to_channel:
                 await update.message.reply_text("📤 Phase 4: Channel Publishing...")
-                await self.unlimited_channel_send(deals[:5], search_term)
-                await update.message.reply_text("✅ Successfully posted to channel!")
+                delivered = await self.unlimited_channel_send(deals, search_term)
+                posted = sum(delivered.values())
+                if not delivered:
+                    await update.message.reply_text("ℹ️ No channel matched these deals; nothing was posted.")
+                elif posted == len(delivered):
+                    await update.message.reply_text(f"✅ Successfully posted to {posted} channel(s)!")
+                else:
+                    failed = ", ".join(name for name, ok in delivered.items() if not ok)
+                    await update.message.reply_text(f"⚠️ Posted to {posted}/{len(delivered)} channels "
+                                                    f"(failed: {failed})")
             
             final_time = time.time() - start_time
             await update.message.reply_text(f"🎉 Mission Complete! Total time: {final_time:.1f}s")
@@ -243,103 +738,37 @@ class DealsBot:
         return int(review_match.group(1)) if review_match else 0
     
     def format_deal_message(self, deal, rank):
-        """Format deal information for Telegram message"""
+        """Format deal information for Telegram message (scraped text is HTML-escaped)"""
         rank_emoji = {1: "🥇", 2: "🥈", 3: "🥉", 4: "4️⃣", 5: "5️⃣"}.get(rank, f"{rank}️⃣")
         prime_text = "🚀 Prime" if deal['prime_eligible'] else ""
         
         return f"""
-{rank_emoji} <b>{deal['title'][:100]}...</b>
+{rank_emoji} <b>{html.escape(deal['title'][:100])}...</b>
 
 💰 <b>Price:</b> ₹{deal['current_price']:,.0f}
 🏷️ <b>Original:</b> ₹{deal['original_price']:,.0f}
 📉 <b>Discount:</b> {deal['discount_percent']:.1f}%
 💾 <b>Save:</b> ₹{deal['savings']:,.0f}
-⭐ <b>Rating:</b> {deal['rating']}/5 ({deal['review_count']} reviews)
+⭐ <b>Rating:</b> {html.escape(str(deal['rating']))}/5 ({html.escape(str(deal['review_count']))} reviews)
 📦 <b>Status:</b> Available {prime_text}
 🏆 <b>Score:</b> {deal['deal_score']:.1f}
 
-🔗 <a href="{deal['url']}">BUY NOW</a>
+🔗 <a href="{html.escape(deal['url'])}">BUY NOW</a>
         """
     
     async def unlimited_channel_send(self, deals, search_term):
-        """Send to channel with unlimited time and maximum retries"""
+        """Fan a ranked result set out to every routed channel; returns {channel: delivered}"""
         try:
-            if not Config.CHANNEL_ID or not deals:
-                return
-            
-            from datetime import datetime
-            current_time = datetime.now().strftime("%I:%M %p")
-            
-            # Header
-            header = f"""
-🚨 <b>MEGA DEALS ALERT</b> 🚨
-🔥 <b>Top {search_term.upper()} Deals</b>
-📅 <b>Found at:</b> {current_time}
-💎 <b>Premium {len(deals)} Deals</b>
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-            """
-            
-            await self.persistent_send(header)
-            
-            # Send each deal with maximum persistence
-            for i, deal in enumerate(deals, 1):
-                rank_emoji = {1: "🥇", 2: "🥈", 3: "🥉", 4: "4️⃣", 5: "5️⃣"}.get(i, f"{i}️⃣")
-                prime_text = "🚀 Prime" if deal['prime_eligible'] else ""
-                
-                channel_deal = f"""
-{rank_emoji} <b>{deal['title'][:80]}...</b>
-
-💰 <b>₹{deal['current_price']:,.0f}</b> <s>₹{deal['original_price']:,.0f}</s>
-🔥 <b>{deal['discount_percent']:.0f}% OFF</b> • Save ₹{deal['savings']:,.0f}
-⭐ <b>{deal['rating']}/5</b> ({deal['review_count']} reviews) {prime_text}
-
-🛒 <a href="{deal['url']}"><b>BUY NOW</b></a>
-                """
-                
-                await self.persistent_send(channel_deal)
-                await asyncio.sleep(1.5)  # Generous delay
-            
-            # Footer
-            footer = f"""
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-🤖 <b>Want more deals?</b> Use our bot!
-🔔 <b>Enable notifications</b> for instant alerts!
-
-#AmazonDeals #{search_term.replace(' ', '')} #MegaSale
-            """
-            
-            await self.persistent_send(footer)
-            logger.info(f"Channel posting completed for {len(deals)} deals")
+            if not self.channel_routes or not deals:
+                return {}
+            delivered = await self.publisher.publish(deals, search_term)
+            logger.info(f"Channel posting completed for '{search_term}': "
+                        f"{sum(delivered.values())}/{len(delivered)} channels")
+            return delivered
             
         except Exception as e:
             logger.error(f"Channel send error: {str(e)}")
-    
-    async def persistent_send(self, message):
-        """Send message with maximum persistence - never give up"""
-        max_attempts = 10
-        base_delay = 2
-        
-        for attempt in range(max_attempts):
-            try:
-                await self.app.bot.send_message(
-                    chat_id=Config.CHANNEL_ID,
-                    text=message,
-                    parse_mode='HTML',
-                    disable_web_page_preview=False
-                )
-                return  # Success!
-                
-            except Exception as e:
-                wait_time = base_delay * (2 ** attempt)  # Exponential backoff
-                logger.warning(f"Send attempt {attempt + 1} failed, waiting {wait_time}s: {str(e)}")
-                
-                if attempt < max_attempts - 1:
-                    await asyncio.sleep(wait_time)
-                else:
-                    logger.error(f"Failed to send after {max_attempts} attempts")
-                    raise
+            return {route.name: False for route in self.channel_routes}
     
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Start command handler"""
@@ -355,6 +784,7 @@ class DealsBot:
 
 <b>Commands:</b>
 /deals - Unlimited time deal search
+/watch - Price alerts for a product
 /help - Detailed help
 
 <b>Current Settings:</b>
@@ -381,11 +811,23 @@ Ready for unlimited deal hunting! 🚀
 • min_budget=VALUE
 • max_budget=VALUE
 • min_review_count=VALUE
+• deadline=VALUE (e.g. 20s or 2m: best deals found in that time, refined afterwards)
 
 <b>Examples:</b>
 • /deals search_term=smartphone
 • /deals search_term=laptop min_discount=30 max_pages=10
 • /deals min_discount=50 min_budget=20000
+• /deals search_term=headphones deadline=20s
+
+<b>Price Alerts:</b>
+• /watch gaming laptop under 60k 25% off - get a message when a crawl finds a match
+• /watches - list your watches
+• /unwatch ID - remove a watch
+
+<b>Inline Search:</b>
+Type @botname in any chat to search products we've already found:
+• @botname laptop under 50000
+• @botname phone 10k-20k 30% off
 
 <b>Unlimited Features:</b>
 • ⏰ No timeout restrictions
@@ -404,21 +846,95 @@ Let it run as long as needed! 🚀
             # Create application with maximum timeout settings
             application = (Application.builder()
                          .token(self.token)
-                         .read_timeout(300)      # 5 minutes
-                         .write_timeout(300)     # 5 minutes
-                         .connect_timeout(300)   # 5 minutes
+                         # Bot API calls are timed into /profile reports
+                         .request(ProfiledRequest(
+                             read_timeout=300,      # 5 minutes
+                             write_timeout=300,     # 5 minutes
+                             connect_timeout=300    # 5 minutes
+                         ))
+                         .post_init(self.post_init)
+                         .application_class(LatencyTrackingApplication)
+                         .update_queue(TimedUpdateQueue())
                          .build())
             
             self.app = application
+            self.publisher = ChannelPublisher(
+                application.bot, self.channel_routes,
+                global_rate=Config.CHANNEL_GLOBAL_RATE,
+                chat_rate_per_minute=Config.CHANNEL_MESSAGES_PER_MINUTE,
+                max_attempts=Config.CHANNEL_SEND_ATTEMPTS
+            )
             
             # Add handlers
             application.add_handler(CommandHandler("start", self.start))
-            application.add_handler(CommandHandler("deals", self.deals_command))
+            deals_handler = self.deals_command
+            if Config.PROFILE_ENABLED:
+                deals_handler = self.profiled(self.deals_command, "deals")
+            application.add_handler(CommandHandler("deals", deals_handler))
+            application.add_handler(CommandHandler("profile", self.profile_command))
+            application.add_handler(CommandHandler("channels", self.channels_command))
             application.add_handler(CommandHandler("help", self.help_command))
+            application.add_handler(CommandHandler("watch", self.watch_command))
+            application.add_handler(CommandHandler("unwatch", self.unwatch_command))
+            application.add_handler(CommandHandler("watches", self.watches_command))
+            application.add_handler(InlineQueryHandler(self.inline_query))
+            
+            self.seed_product_index()
             
-            logger.info("🚀 Starting UNLIMITED Amazon Deals Bot...")
-            application.run_polling(drop_pending_updates=True)
+            if self.deal_views is not None:
+                scheduler = DealScheduler(self)
+                scheduler.schedule_view_refresh(Config.DEAL_VIEW_TERMS, Config.DEAL_VIEW_REFRESH_MINUTES)
+                scheduler.start_scheduler()
+            
+            if Config.BOT_MODE == 'webhook':
+                logger.info("🚀 Starting UNLIMITED Amazon Deals Bot (webhook mode)...")
+                asyncio.run(self.run_webhook(application))
+            else:
+                logger.info("🚀 Starting UNLIMITED Amazon Deals Bot...")
+                application.run_polling(drop_pending_updates=True)
+                logger.info(f"Polling stopped: {application.latency_stats['processed']} updates, "
+                            f"avg latency {application.average_latency * 1000:.1f}ms, "
+                            f"max {application.latency_stats['max_latency'] * 1000:.1f}ms")
             
         except Exception as e:
             logger.error(f"Bot startup error: {str(e)}")
             raise
+    
+    async def post_init(self, application):
+        # Crawl threads hand watch alerts back to the bot's event loop
+        self.loop = asyncio.get_running_loop()
+    
+    async def run_webhook(self, application):
+        """Receive updates through a webhook instead of long polling"""
+        if not Config.WEBHOOK_URL.startswith('https://'):
+            raise ValueError("BOT_MODE=webhook requires WEBHOOK_URL: the https URL of a TLS "
+                             "terminator that forwards to WEBHOOK_PORT (the receiver is plain HTTP)")
+        
+        secret_token = Config.WEBHOOK_SECRET or secrets.token_urlsafe(32)
+        receiver = WebhookReceiver(
+            application,
+            listen=Config.WEBHOOK_LISTEN,
+            port=Config.WEBHOOK_PORT,
+            path=Config.WEBHOOK_PATH,
+            secret_token=secret_token,
+            queue_size=Config.WEBHOOK_QUEUE_SIZE,
+            workers=Config.WEBHOOK_WORKERS
+        )
+        
+        async with application:
+            await self.post_init(application)
+            await application.start()
+            await receiver.start()
+            await application.bot.set_webhook(
+                url=Config.WEBHOOK_URL,
+                secret_token=secret_token,
+                drop_pending_updates=True,
+                max_connections=min(100, Config.WEBHOOK_WORKERS * 10)  # Bot API accepts 1-100
+            )
+            try:
+                await receiver.serve_forever()
+            finally:
+                await receiver.stop()
+                await application.stop()
+                logger.info(f"Webhook stopped: {receiver.stats['processed']} updates, "
+                            f"avg latency {receiver.average_latency * 1000:.1f}ms")
@@ -0,0 +1,127 @@
+import asyncio
+import os
+import sys
+import time
+import unittest
+
+from telegram.error import Forbidden, RetryAfter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from channel_publisher import ChannelPublisher, ChannelRoute
+
+SEND_LATENCY = 0.05  # seconds one send_message call takes
+
+
+class FakeBot:
+    """Records every send_message; chats in `retry_after` get RetryAfter on their
+    n-th message, chats in `forbidden` always get Forbidden"""
+
+    def __init__(self, retry_after=None, forbidden=()):
+        self.retry_after = dict(retry_after or {})  # chat id -> message number that is throttled once
+        self.forbidden = set(forbidden)
+        self.attempts = {}  # chat id -> send_message calls
+        self.sent = []      # (chat id, sent at, text)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.attempts[chat_id] = self.attempts.get(chat_id, 0) + 1
+        await asyncio.sleep(SEND_LATENCY)
+        if chat_id in self.forbidden:
+            raise Forbidden('Forbidden: bot was kicked from the channel chat')
+        if self.retry_after.get(chat_id) == self.attempts[chat_id]:
+            raise RetryAfter(1)
+        self.sent.append((chat_id, time.monotonic(), text))
+
+    def times(self, chat_id):
+        return [sent_at for chat, sent_at, _ in self.sent if chat == chat_id]
+
+    def texts(self, chat_id):
+        return [text for chat, _, text in self.sent if chat == chat_id]
+
+
+def deal(i, price):
+    return {
+        'title': f'Stub Laptop {i}', 'current_price': float(price), 'original_price': price * 1.5,
+        'discount_percent': 33.0, 'savings': price * 0.5, 'rating': 4.3, 'review_count': 1234,
+        'prime_eligible': False, 'url': f'https://www.amazon.in/dp/B{i:09d}',
+    }
+
+
+DEALS = [deal(i, 30000 + i * 10000) for i in range(9)]  # 30k to 110k
+ROUTES = [
+    ChannelRoute('budget', -1, max_price=60000, max_deals=3),
+    ChannelRoute('mid', -2, min_price=60000, max_price=90000, max_deals=3),
+    ChannelRoute('premium', -3, min_price=90000, max_deals=3),
+]
+
+
+class ChannelPublisherTest(unittest.TestCase):
+    """Concurrent, paced delivery against a fake bot that throttles and rejects chats"""
+
+    def publish(self, bot, **kwargs):
+        options = dict(global_rate=1000, chat_rate_per_minute=6000, chat_burst=10, base_delay=0.01)
+        options.update(kwargs)
+        publisher = ChannelPublisher(bot, ROUTES, **options)
+        started = time.monotonic()
+        with self.assertLogs('channel_publisher', level='INFO'):
+            delivered = asyncio.run(publisher.publish(DEALS, 'laptop'))
+        return publisher, delivered, time.monotonic() - started
+
+    def test_routes_are_delivered_concurrently_and_in_order(self):
+        bot = FakeBot()
+        publisher, delivered, elapsed = self.publish(bot)
+
+        self.assertEqual(delivered, {'budget': True, 'mid': True, 'premium': True})
+        # Header, three deals and footer per channel; 15 sends one after another would take 0.75s
+        self.assertEqual(len(bot.sent), 15)
+        self.assertLess(elapsed, 5 * SEND_LATENCY + 0.15)
+        for route in ROUTES:
+            texts = bot.texts(route.chat_id)
+            self.assertIn('MEGA DEALS ALERT', texts[0])
+            self.assertIn('Want more deals?', texts[-1])
+            for text, selected in zip(texts[1:4], route.select(DEALS, 'laptop')):
+                self.assertIn(selected['url'], text)
+            self.assertEqual(publisher.stats[route.name].messages_sent, 5)
+
+    def test_each_chat_is_paced_after_its_burst(self):
+        bot = FakeBot()
+        self.publish(bot, chat_rate_per_minute=300, chat_burst=2)  # 5 per second after 2 at once
+
+        for route in ROUTES:
+            times = bot.times(route.chat_id)
+            self.assertEqual(len(times), 5)
+            # The first two go out back to back, then one per 0.2s slot
+            self.assertLess(times[1] - times[0], 2 * SEND_LATENCY)
+            for n in range(2, 5):
+                self.assertGreaterEqual(times[n] - times[0], (n - 1) * 0.2 - 0.02)
+
+    def test_retry_after_is_honoured_without_holding_up_other_channels(self):
+        bot = FakeBot(retry_after={-2: 2})
+        publisher, delivered, _ = self.publish(bot)
+
+        self.assertEqual(delivered, {'budget': True, 'mid': True, 'premium': True})
+        mid = publisher.stats['mid']
+        self.assertEqual((mid.retries, mid.messages_sent, mid.messages_failed), (1, 5, 0))
+        self.assertEqual(bot.attempts[-2], 6)
+        times = bot.times(-2)
+        self.assertGreaterEqual(times[1] - times[0], 1.0)  # the throttled message waited retry_after
+        self.assertEqual(len(bot.texts(-2)), len(set(bot.texts(-2))))
+        self.assertLess(publisher.stats['budget'].last_post_seconds, 0.5)
+        self.assertLess(publisher.stats['premium'].last_post_seconds, 0.5)
+
+    def test_forbidden_channel_fails_fast_without_delaying_the_others(self):
+        bot = FakeBot(forbidden={-3})
+        publisher, delivered, elapsed = self.publish(bot, max_attempts=5, base_delay=1.0)
+
+        self.assertEqual(delivered, {'budget': True, 'mid': True, 'premium': False})
+        premium = publisher.stats['premium']
+        self.assertEqual(bot.attempts[-3], 1)  # not retried
+        self.assertEqual((premium.messages_sent, premium.messages_failed, premium.retries), (0, 1, 0))
+        self.assertIn('kicked', premium.last_error)
+        self.assertEqual(publisher.stats['budget'].messages_sent, 5)
+        self.assertEqual(publisher.stats['mid'].messages_sent, 5)
+        self.assertLess(elapsed, 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+import contextlib
+import os
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from amazon_scraper import AmazonDealsScraper
+from fetch_control import ThrottledFetcher
+
+PRODUCTS_PER_PAGE = 16
+FILLER = '<div class="s-result-item"><span>filler listing text</span></div>' * 60  # ~4 KB
+# Long enough that 5,000 products held in memory outgrow the RSS bound
+SPECS = 'with backlit keyboard, fingerprint reader, Wi-Fi 6 and Thunderbolt 4 ' * 200  # ~14 KB
+# One product on every 100th page has a huge body; streaming truncates it
+HUGE_PAGE_EVERY = 100
+HUGE_FILLER_BYTES = 32 * 1024 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+
+
+def search_page(page):
+    links = ''.join(
+        f'<a class="a-link-normal" href="/Stub-Product/dp/B{page:04d}{i:05d}/ref=sr_1_{i}">Product</a>'
+        for i in range(PRODUCTS_PER_PAGE)
+    )
+    return f'<html><body>{links}{FILLER}</body></html>'
+
+
+def product_page(asin):
+    return f"""<html><body>
+<span id="productTitle">Stub Laptop {asin} 16GB RAM 512GB SSD {SPECS}</span>
+<span class="a-price-whole">45,999</span>
+<span class="a-price a-text-price"><span class="a-offscreen">₹69,999</span></span>
+<span class="a-icon-alt">4.3 out of 5 stars</span>
+<span id="acrCustomerReviewText">1,234 ratings</span>
+<div id="availability"><span>In stock</span></div>
+</body></html>"""
+
+
+def padding_bytes(asin):
+    """Size of the filler appended to a product page (the first product of every 100th page)"""
+    huge = int(asin[1:5]) % HUGE_PAGE_EVERY == 0 and asin.endswith('00000')
+    return HUGE_FILLER_BYTES if huge else 0
+
+
+class StubAmazonHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        padding = 0
+        if url.path == '/s':
+            body = search_page(int(parse_qs(url.query)['page'][0]))
+        elif url.path.startswith('/dp/'):
+            asin = url.path.split('/')[2]
+            body, padding = product_page(asin), padding_bytes(asin)
+        else:
+            self.send_error(404)
+            return
+        data = body.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data) + padding))
+        self.end_headers()
+        try:
+            # The filler goes out in chunks so the stub itself stays small:
+            # it shares the crawler's process and RSS
+            self.wfile.write(data[:-len('</body></html>')])
+            chunk = b'x' * (64 * 1024)
+            for offset in range(0, padding, len(chunk)):
+                self.wfile.write(chunk[:padding - offset])
+            self.wfile.write(b'</body></html>')
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the crawler stopped reading a truncated body
+
+
+class BoundedCrawlMemoryTest(unittest.TestCase):
+    """Peak RSS of a bounded-memory crawl must not grow with the number of pages.
+
+    The companion tests turn off spilling or streaming and check that the
+    same crawl then does outgrow the bound, so the bound means something.
+    """
+
+    MAX_GROWTH_MB = 25
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubAmazonHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_port}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        # One-off import and allocator growth would otherwise land in the 5-page baseline
+        self.crawl(5)
+
+    def crawl(self, pages, spill_threshold=200, max_body_bytes=MAX_BODY_BYTES):
+        session = requests.Session()
+        session.trust_env = False  # skip the per-request proxy environment lookup
+        scraper = AmazonDealsScraper(
+            search_term='laptop', max_pages=pages, min_discount=0, min_review_count=0,
+            fetcher=ThrottledFetcher(initial_rate=100000, max_rate=100000, session=session),
+            spill_threshold=spill_threshold, max_body_bytes=max_body_bytes
+        )
+        scraper.base_url = self.base_url
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            products = scraper.scrape_search_results()
+            self.assertEqual(len(products), pages * 10)
+            if pages == 5:
+                self.assertFalse(scraper.filter_best_deals(products).empty)
+        if hasattr(products, 'close'):
+            products.close()
+        del products
+        return scraper.last_crawl_stats
+
+    def growth(self, **options):
+        """Peak RSS growth in MiB from a 5-page to a 500-page crawl"""
+        small = self.crawl(5, **options)
+        large = self.crawl(500, **options)
+        return large['peak_rss_mb'] - small['peak_rss_mb'], large
+
+    def test_peak_rss_flat_across_crawl_sizes(self):
+        stats = {pages: self.crawl(pages) for pages in (5, 50, 500)}
+        peaks = {pages: crawl['peak_rss_mb'] for pages, crawl in stats.items()}
+        self.assertGreater(stats[500]['spilled'], 0)
+        self.assertLess(max(peaks.values()) - peaks[5], self.MAX_GROWTH_MB, f"peak RSS by page count: {peaks}")
+
+    def test_unspilled_products_outgrow_the_bound(self):
+        growth, large = self.growth(spill_threshold=None)
+        self.assertEqual(large['spilled'], 0)
+        self.assertGreater(growth, self.MAX_GROWTH_MB, f"peak RSS grew {growth:.1f} MiB")
+
+    def test_unstreamed_bodies_outgrow_the_bound(self):
+        growth, _ = self.growth(max_body_bytes=None)
+        self.assertGreater(growth, self.MAX_GROWTH_MB, f"peak RSS grew {growth:.1f} MiB")
+
+
+if __name__ == '__main__':
+    unittest.main()
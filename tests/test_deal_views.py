@@ -0,0 +1,55 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from amazon_scraper import AmazonDealsScraper
+from deal_views import DealViewStore
+
+BUCKET = {'min_discount': 10.0, 'min_review_count': 10, 'min_budget': 20000.0, 'max_budget': 150000.0}
+
+
+def product(i, price, discount):
+    return {
+        'title': f'Laptop {i}', 'current_price': f'₹{price:,}', 'original_price': '₹200,000',
+        'discount_percent': discount, 'rating': '4.2', 'review_count': '500',
+        'availability': 'In stock', 'prime_eligible': False, 'is_available': True,
+        'original_url': f'https://www.amazon.in/dp/B{i:09d}', 'affiliate_url': f'https://www.amazon.in/dp/B{i:09d}',
+    }
+
+
+class DealViewCoverageTest(unittest.TestCase):
+    """A view only answers stricter queries when it holds every deal of its bucket"""
+
+    def store(self, products, view_size):
+        store = DealViewStore(buckets=[BUCKET], view_size=view_size)
+        store.update(AmazonDealsScraper(search_term='laptop', fetcher=object()), products)
+        return store
+
+    def lookup(self, store, **overrides):
+        query = dict(BUCKET, **overrides)
+        return store.lookup('laptop', query['min_discount'], query['min_review_count'],
+                            query['min_budget'], query['max_budget'], max_pages=5)
+
+    def setUp(self):
+        # Cheap laptops have the best discounts, so they fill the top of the ranking
+        self.products = [product(i, 20000 + i * 1000, 60 - i * 0.5) for i in range(100)]
+
+    def test_truncated_view_answers_only_its_own_thresholds(self):
+        store = self.store(self.products, view_size=50)
+        self.assertIsNotNone(self.lookup(store))
+        # Most laptops over 100k rank below the view's top 50
+        self.assertIsNone(self.lookup(store, min_budget=100000.0))
+        self.assertIsNone(self.lookup(store, min_discount=30.0))
+
+    def test_complete_view_answers_stricter_queries(self):
+        store = self.store(self.products, view_size=200)
+        view = self.lookup(store, min_budget=100000.0)
+        self.assertIsNotNone(view)
+        self.assertEqual(len(view.select(10.0, 10, 100000.0, 150000.0)), 20)
+        self.assertIsNone(self.lookup(store, min_budget=10000.0))  # looser than the bucket
+
+
+if __name__ == '__main__':
+    unittest.main()
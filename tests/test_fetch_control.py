@@ -0,0 +1,206 @@
+import contextlib
+import os
+import sys
+import threading
+import time
+import unittest
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from amazon_scraper import AmazonDealsScraper
+from fetch_control import CAPTCHA, OK, THROTTLED, TIMED_OUT, CircuitBreaker, ThrottledFetcher
+
+CAPTCHA_PAGE = ('<html><body><form action="/errors/validateCaptcha">'
+                'Type the characters you see in this image</form></body></html>')
+
+
+def search_page(page):
+    links = ''.join(
+        f'<a class="a-link-normal" href="/Stub-Product/dp/B{page:04d}{i:05d}/ref=sr_1_{i}">Product</a>'
+        for i in range(12)
+    )
+    return f'<html><body>{links}</body></html>'
+
+
+def product_page(asin):
+    return f"""<html><body>
+<span id="productTitle">Stub Laptop {asin}</span>
+<span class="a-price-whole">45,999</span>
+<span class="a-price a-text-price"><span class="a-offscreen">₹69,999</span></span>
+<span class="a-icon-alt">4.3 out of 5 stars</span>
+<span id="acrCustomerReviewText">1,234 ratings</span>
+<div id="availability"><span>In stock</span></div>
+</body></html>"""
+
+
+class ThrottlingHandler(BaseHTTPRequestHandler):
+    """Serves search and product pages, but answers with the server's queued
+    failures (503, 429 or 'captcha') first, or every `fail_every`-th request"""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            failure = server.plan.popleft() if server.plan else None
+            if failure is None and server.fail_every and server.requests % server.fail_every == 0:
+                failure = server.failure_cycle[server.requests // server.fail_every % len(server.failure_cycle)]
+        if failure in (429, 503):
+            self.send_error(failure)
+            return
+        if failure == 'captcha':
+            self.respond(CAPTCHA_PAGE)
+            return
+
+        url = urlparse(self.path)
+        if url.path == '/s':
+            self.respond(search_page(int(parse_qs(url.query)['page'][0])))
+        elif url.path.startswith('/dp/'):
+            self.respond(product_page(url.path.split('/')[2]))
+        else:
+            self.send_error(404)
+
+    def respond(self, body):
+        data = body.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FetchBackoffTest(unittest.TestCase):
+    """AIMD pacing and the circuit breaker against a stub that pushes back"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), ThrottlingHandler)
+        cls.server.lock = threading.Lock()
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_port}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.plan = deque()
+        self.server.requests = 0
+        self.server.fail_every = 0
+        self.server.failure_cycle = [503, 429, 'captcha']
+        devnull = open(os.devnull, 'w')
+        self.addCleanup(devnull.close)
+        quiet = contextlib.redirect_stdout(devnull)
+        quiet.__enter__()
+        self.addCleanup(quiet.__exit__, None, None, None)
+
+    def fetcher(self, **kwargs):
+        options = dict(initial_rate=200, max_rate=200, max_retries=0, reset_timeout=0.2, max_wait=5)
+        options.update(kwargs)
+        return ThrottledFetcher(**options)
+
+    def host_state(self, fetcher):
+        return fetcher._host_state(urlparse(self.base_url).netloc)
+
+    def test_rate_halves_on_throttling_and_climbs_back(self):
+        fetcher = self.fetcher(initial_rate=80, max_rate=160)
+        limiter, _ = self.host_state(fetcher)
+        self.server.plan.extend([503, 429])
+
+        self.assertEqual(fetcher.fetch(self.base_url + '/dp/B000000001')[0], THROTTLED)
+        self.assertAlmostEqual(limiter.rate, 40)
+        self.assertEqual(fetcher.fetch(self.base_url + '/dp/B000000001')[0], THROTTLED)
+        self.assertAlmostEqual(limiter.rate, 20)
+
+        for _ in range(20):
+            self.assertEqual(fetcher.fetch(self.base_url + '/dp/B000000001')[0], OK)
+        self.assertAlmostEqual(limiter.rate, 21)
+
+    def test_breaker_opens_probes_and_closes(self):
+        fetcher = self.fetcher()
+        _, breaker = self.host_state(fetcher)
+        self.server.plan.extend([503, 503, 'captcha'])
+        for expected in (THROTTLED, THROTTLED, CAPTCHA):
+            self.assertEqual(fetcher.fetch(self.base_url + '/dp/B000000001')[0], expected)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertGreater(breaker.time_until_retry(), 0)
+
+        # A failed probe re-opens the circuit with a doubled timeout
+        self.server.plan.append(503)
+        self.assertEqual(fetcher.fetch(self.base_url + '/dp/B000000001')[0], THROTTLED)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertAlmostEqual(breaker.reset_timeout, 0.4)
+
+        time.sleep(0.45)
+        self.assertTrue(breaker.before_request())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(breaker.before_request())  # only one probe at a time
+        breaker.cancel_probe()
+
+        # A successful probe closes it and resets the timeout
+        self.assertEqual(fetcher.fetch(self.base_url + '/dp/B000000001')[0], OK)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertAlmostEqual(breaker.reset_timeout, 0.2)
+
+    def test_release_probe_reopens_without_doubling(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+        breaker.record_failure()
+        time.sleep(0.15)
+        self.assertTrue(breaker.before_request())
+
+        breaker.release_probe()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertAlmostEqual(breaker.reset_timeout, 0.1)
+        self.assertGreater(breaker.time_until_retry(), 0)
+
+    def test_cancel_probe_keeps_circuit_half_open(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+        breaker.record_failure()
+        time.sleep(0.15)
+        opened_at = breaker.opened_at
+        self.assertTrue(breaker.before_request())
+
+        breaker.cancel_probe()
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertEqual(breaker.opened_at, opened_at)
+        self.assertEqual(breaker.time_until_retry(), 0)
+        self.assertTrue(breaker.before_request())
+
+    def test_deadline_timeout_does_not_reopen_circuit(self):
+        fetcher = self.fetcher(initial_rate=0.2, max_rate=0.2, failure_threshold=1)
+        _, breaker = self.host_state(fetcher)
+        self.server.plan.append(503)
+        self.assertEqual(fetcher.fetch(self.base_url + '/dp/B000000001')[0], THROTTLED)
+        time.sleep(0.25)
+
+        # The probe is claimed, but the rate limiter's next slot is past the deadline
+        started = time.monotonic()
+        kind, _ = fetcher.fetch(self.base_url + '/dp/B000000001', deadline=time.monotonic() + 1)
+        self.assertEqual(kind, TIMED_OUT)
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertEqual(breaker.time_until_retry(), 0)
+
+    def test_crawl_finishes_through_throttling_and_captchas(self):
+        self.server.fail_every = 10
+        fetcher = self.fetcher(initial_rate=10000, max_rate=10000, max_retries=3,
+                               failure_threshold=5, reset_timeout=0.05)
+        scraper = AmazonDealsScraper(search_term='laptop', max_pages=5, min_discount=0,
+                                     min_review_count=0, fetcher=fetcher)
+        scraper.base_url = self.base_url
+        products = scraper.scrape_search_results()
+
+        self.assertEqual(len(products), 5 * 10)
+        self.assertFalse(scraper.crawl_blocked)
+        self.assertGreater(fetcher.stats[THROTTLED], 0)
+        self.assertGreater(fetcher.stats[CAPTCHA], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+import contextlib
+import os
+import random
+import socket
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fetch_control import ERROR, OK, ThrottledFetcher
+from identity_pool import IdentityPool, RequestIdentity
+
+CAPTCHA_PAGE = ('<html><body><form action="/errors/validateCaptcha">'
+                'Type the characters you see in this image</form></body></html>')
+HEADER_SETS = [{'X-Stub-Identity': name} for name in ('good', 'also-good', 'flagged')]
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """A stand-in for both Amazon and a plain-HTTP proxy in front of it.
+
+    As a proxy it answers 502 while `server.down` is set; as the site it
+    serves a captcha to header sets named in `server.flagged`.
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.server.down:
+            self.send_error(502)
+            return
+        if self.headers.get('X-Stub-Identity') in self.server.flagged:
+            body = CAPTCHA_PAGE
+        else:
+            body = f'<html><body>Product {urlparse(self.path).path}</body></html>'
+        data = body.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    server.down = False
+    server.flagged = set()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class IdentityPoolTest(unittest.TestCase):
+    """Failing header sets and proxies fade out of the rotation and come back once they work"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.site = start_server()
+        cls.proxy = start_server()
+        cls.site_url = f'http://127.0.0.1:{cls.site.server_port}'
+        cls.proxy_url = f'http://127.0.0.1:{cls.proxy.server_port}'
+
+    @classmethod
+    def tearDownClass(cls):
+        for server in (cls.site, cls.proxy):
+            server.shutdown()
+            server.server_close()
+
+    def setUp(self):
+        random.seed(1)
+        self.site.flagged = {'flagged'}
+        self.proxy.down = True
+        devnull = open(os.devnull, 'w')
+        self.addCleanup(devnull.close)
+        quiet = contextlib.redirect_stdout(devnull)
+        quiet.__enter__()
+        self.addCleanup(quiet.__exit__, None, None, None)
+
+    def crawl(self, fetcher, count):
+        """Fetch `count` pages; returns how many went through each identity"""
+        used = {}
+        original_choose = fetcher.identity_pool.choose
+
+        def choose():
+            identity = original_choose()
+            if identity is not None:
+                used[identity.name] = used.get(identity.name, 0) + 1
+            return identity
+
+        fetcher.identity_pool.choose = choose
+        try:
+            for i in range(count):
+                self.assertEqual(fetcher.fetch(f'{self.site_url}/dp/B{i:09d}')[0], OK)
+        finally:
+            fetcher.identity_pool.choose = original_choose
+        return used
+
+    def test_failing_identities_fade_out_and_recover(self):
+        # Every header set direct, and again through a proxy that is refusing requests
+        identities = [RequestIdentity(f'h{i}', headers) for i, headers in enumerate(HEADER_SETS)]
+        identities += [RequestIdentity(f'h{i}-p', headers, proxy=self.proxy_url)
+                       for i, headers in enumerate(HEADER_SETS)]
+        pool = IdentityPool(identities, cool_off=0.2, max_cool_off=1, error_cool_off=0.05)
+        fetcher = ThrottledFetcher(initial_rate=10000, max_rate=10000, max_retries=10,
+                                   failure_threshold=1000, identity_pool=pool)
+        good = {'h0', 'h1'}
+
+        self.crawl(fetcher, 300)
+        used = self.crawl(fetcher, 300)
+        health = {i.name: i.health for i in pool.identities}
+        bad = set(health) - good
+        self.assertEqual(bad, {'h2', 'h0-p', 'h1-p', 'h2-p'})
+        for name in bad:
+            self.assertLess(health[name], 0.25, health)
+        for name in good:
+            self.assertGreater(health[name], 0.9, health)
+        self.assertGreater(sum(used.get(name, 0) for name in good), 0.9 * sum(used.values()), used)
+
+        # The captcha flag lifts and the proxy comes back
+        self.site.flagged = set()
+        self.proxy.down = False
+        for _ in range(20):
+            self.crawl(fetcher, 200)
+            if all(i.health > 0.5 for i in pool.identities):
+                break
+        self.assertTrue(all(i.health > 0.5 for i in pool.identities), pool.summary())
+
+    def test_connection_errors_count_against_a_dead_proxy(self):
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            dead_proxy = f'http://127.0.0.1:{probe.getsockname()[1]}'
+        dead = RequestIdentity('dead', {}, proxy=dead_proxy)
+        pool = IdentityPool([dead], cool_off=0.2, error_cool_off=0.05)
+        fetcher = ThrottledFetcher(initial_rate=10000, max_rate=10000, max_retries=0, identity_pool=pool)
+
+        self.assertEqual(fetcher.fetch(f'{self.site_url}/dp/B000000001')[0], ERROR)
+        self.assertLess(dead.health, 0.5)
+        self.assertTrue(dead.is_cooling())
+        self.assertEqual(dead.consecutive_errors, 1)
+
+        pool.report(dead, ERROR)
+        pool.report(dead, ERROR)
+        # 0.05 s doubling per consecutive error, capped at the captcha cool-off
+        self.assertLessEqual(pool.time_until_available(), 0.2)
+        self.assertGreater(pool.time_until_available(), 0.15)
+
+        pool.report(dead, OK)
+        self.assertEqual(dead.consecutive_errors, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
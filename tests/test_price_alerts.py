@@ -0,0 +1,123 @@
+import os
+import random
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deal_dataset import to_dataset_record
+from price_alerts import PriceAlertIndex, WatchRule
+from product_index import tokenize
+
+CATEGORIES = [f'category{i}' for i in range(50)]
+BRANDS = [f'brand{i}' for i in range(200)]
+
+
+def make_rules(count, rules_per_user=5):
+    """Watch rules on a category alone, or on a brand within a category"""
+    rules = []
+    for i in range(count):
+        if random.random() < 0.4:
+            term = random.choice(CATEGORIES)
+        else:
+            term = f'{random.choice(BRANDS)} {random.choice(CATEGORIES)}'
+        rules.append(WatchRule(i // rules_per_user, i % rules_per_user, term,
+                               max_price=random.choice([None, 20000, 50000, 100000]),
+                               min_discount=random.choice([0, 10, 20, 30])))
+    return rules
+
+
+def make_products(count):
+    return [{
+        'title': f'{random.choice(BRANDS)} {random.choice(CATEGORIES)} model {i}',
+        'current_price': f'₹{random.randint(1000, 150000):,}',
+        'discount_percent': random.choice([0, 10, 25, 40]),
+        'rating': '4.1',
+        'affiliate_url': f'https://www.amazon.in/dp/B{i:09d}',
+    } for i in range(count)]
+
+
+class PriceAlertIndexTest(unittest.TestCase):
+    """Bulk loading builds the same index as adding rules one at a time, and matches like a full scan"""
+
+    def setUp(self):
+        random.seed(0)
+
+    def test_bulk_load_matches_one_at_a_time(self):
+        rules = make_rules(10000)
+        bulk = PriceAlertIndex()
+        bulk.add_rules(rules)
+        single = PriceAlertIndex()
+        for rule in rules:
+            single.add_rule(rule)
+
+        self.assertEqual(len(bulk), len(rules))
+        self.assertEqual(bulk.anchors, single.anchors)
+        self.assertEqual(bulk.buckets, single.buckets)
+
+    def test_bulk_load_replaces_existing_rules(self):
+        index = PriceAlertIndex()
+        index.add_rule(WatchRule(1, 1, 'gaming laptop', max_price=50000))
+        index.add_rules([WatchRule(1, 1, 'mechanical keyboard'), WatchRule(1, 2, 'monitor'),
+                         WatchRule(1, 2, 'curved monitor')])
+
+        self.assertEqual([r.term for r in index.user_rules(1)], ['mechanical keyboard', 'curved monitor'])
+        self.assertEqual(sum(len(bucket) for bucket in index.buckets.values()), 2)
+        with self.assertRaises(ValueError):
+            index.add_rules([WatchRule(2, 1, 'tablet'), WatchRule(2, 2, '')])
+        self.assertEqual(index.user_rules(2), [])
+
+    def test_matches_agree_with_a_full_scan(self):
+        rules = make_rules(2000)
+        products = make_products(300)
+        index = PriceAlertIndex(max_matches_per_user=len(products))
+        index.add_rules(rules)
+
+        expected = {}
+        for product in products:
+            record = to_dataset_record(product, None)
+            title_tokens = set(tokenize(record['title']))
+            for rule in rules:
+                if (rule.tokens <= title_tokens and record['discount_percent'] >= rule.min_discount
+                        and (rule.max_price is None or record['current_price'] <= rule.max_price)):
+                    expected.setdefault(rule.user_id, set()).add(record['affiliate_url'])
+
+        matched = {user_id: {record['url'] for _, record in matches}
+                   for user_id, matches in index.match(products).items()}
+        self.assertEqual(matched, expected)
+
+
+class PriceAlertBenchmark(unittest.TestCase):
+    """Loading 100k saved rules and matching a 10k-product crawl. Run with -s to see the numbers."""
+
+    RULES = 100_000
+    PRODUCTS = 10_000
+    MAX_LOAD_SECONDS = 5
+    MAX_MATCH_SECONDS = 30
+
+    def test_load_and_match(self):
+        random.seed(0)
+        rules = make_rules(self.RULES)
+        products = make_products(self.PRODUCTS)
+        index = PriceAlertIndex()
+
+        started = time.perf_counter()
+        index.add_rules(rules)
+        load_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        batches = index.match(products)
+        match_seconds = time.perf_counter() - started
+
+        matches = sum(len(batch) for batch in batches.values())
+        print(f"\n{self.RULES:,} rules loaded in {load_seconds:.2f}s; {self.PRODUCTS:,} products matched in "
+              f"{match_seconds:.2f}s ({matches:,} matches for {len(batches):,} users)")
+        self.assertEqual(len(index), self.RULES)
+        self.assertLess(load_seconds, self.MAX_LOAD_SECONDS)
+        self.assertLess(match_seconds, self.MAX_MATCH_SECONDS)
+        self.assertTrue(all(len(batch) <= index.max_matches_per_user for batch in batches.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+from telegram.ext import Application, MessageHandler, filters
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from webhook_server import LatencyTrackingApplication, TimedUpdateQueue, WebhookReceiver
+
+UPDATES = 200
+SEND_INTERVAL = 0.01  # seconds between updates "arriving at Telegram"
+LONG_POLL = 1.0       # seconds the fake getUpdates holds an empty poll open
+SECRET = 'bench-secret'
+
+
+class FakeBotAPIHandler(BaseHTTPRequestHandler):
+    """Just enough of the Bot API for polling: getMe, long-polled getUpdates, and True for the rest"""
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        method = self.path.rsplit('/', 1)[1]
+        if method == 'getMe':
+            result = {'id': 1, 'is_bot': True, 'first_name': 'bench', 'username': 'bench_bot'}
+        elif method == 'getUpdates':
+            result = self.server.take_updates(LONG_POLL)
+        else:
+            result = True
+        data = json.dumps({'ok': True, 'result': result}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the poller gave up on an open long poll while shutting down
+
+
+class FakeBotAPI(ThreadingHTTPServer):
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeBotAPIHandler)
+        self.pending = []
+        self.ready = threading.Condition()
+
+    def add_update(self, update):
+        with self.ready:
+            self.pending.append(update)
+            self.ready.notify_all()
+
+    def take_updates(self, timeout):
+        with self.ready:
+            self.ready.wait_for(lambda: self.pending, timeout)
+            updates, self.pending = self.pending, []
+            return updates
+
+
+def make_update(update_id):
+    """A text message whose text is the time it 'reached Telegram'"""
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id, 'date': int(time.time()), 'text': repr(time.monotonic()),
+            'chat': {'id': 5, 'type': 'private'},
+            'from': {'id': 5, 'is_bot': False, 'first_name': 'bench'},
+        },
+    }
+
+
+class UpdateLatencyBenchmark(unittest.TestCase):
+    """Update-to-handler latency, polling vs webhook, against a local fake Bot API.
+
+    End-to-end latency runs from an update reaching the fake Bot API to its
+    handler running; the delivery stats the bot logs (LatencyTrackingApplication
+    for polling, WebhookReceiver for webhooks) run from the update reaching
+    the bot to the handler finishing. Run with -s to see the numbers.
+    """
+
+    MAX_AVERAGE_SECONDS = 0.25
+
+    @classmethod
+    def setUpClass(cls):
+        cls.api = FakeBotAPI()
+        threading.Thread(target=cls.api.serve_forever, daemon=True).start()
+        cls.base_url = f'http://127.0.0.1:{cls.api.server_port}/bot'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.api.shutdown()
+        cls.api.server_close()
+
+    def application(self, builder):
+        latencies = []
+
+        async def handler(update, context):
+            latencies.append(time.monotonic() - float(update.message.text))
+
+        app = builder.token('1:bench').base_url(self.base_url).build()
+        app.add_handler(MessageHandler(filters.ALL, handler))
+        return app, latencies
+
+    async def wait_for(self, latencies):
+        while len(latencies) < UPDATES:
+            await asyncio.sleep(0.05)
+
+    async def run_polling(self):
+        app, latencies = self.application(
+            Application.builder().application_class(LatencyTrackingApplication).update_queue(TimedUpdateQueue())
+        )
+        async with app:
+            await app.start()
+            await app.updater.start_polling(poll_interval=0, timeout=LONG_POLL)
+            for update_id in range(1, UPDATES + 1):
+                self.api.add_update(make_update(update_id))
+                await asyncio.sleep(SEND_INTERVAL)
+            await asyncio.wait_for(self.wait_for(latencies), 30)
+            await app.updater.stop()
+            await app.stop()
+        return latencies, app.average_latency
+
+    async def run_webhook(self):
+        app, latencies = self.application(Application.builder().updater(None))
+        receiver = WebhookReceiver(app, listen='127.0.0.1', port=0, path='/telegram',
+                                   secret_token=SECRET, workers=4)
+        async with app:
+            await app.start()
+            await receiver.start()
+            port = receiver.server.sockets[0].getsockname()[1]
+            async with httpx.AsyncClient() as client:
+                for update_id in range(1, UPDATES + 1):
+                    response = await client.post(f'http://127.0.0.1:{port}/telegram', json=make_update(update_id),
+                                                 headers={'X-Telegram-Bot-Api-Secret-Token': SECRET})
+                    self.assertEqual(response.status_code, 200)
+                    await asyncio.sleep(SEND_INTERVAL)
+            await asyncio.wait_for(self.wait_for(latencies), 30)
+            await receiver.stop()
+            await app.stop()
+        return latencies, receiver.average_latency
+
+    def report(self, mode, latencies, delivery_average):
+        latencies = sorted(latencies)
+        average = sum(latencies) / len(latencies)
+        print(f"\n{mode}: end-to-end avg {average * 1000:.1f}ms, "
+              f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.1f}ms, "
+              f"max {latencies[-1] * 1000:.1f}ms; logged delivery avg {delivery_average * 1000:.1f}ms")
+        self.assertEqual(len(latencies), UPDATES)
+        self.assertLess(average, self.MAX_AVERAGE_SECONDS)
+        self.assertGreater(delivery_average, 0)
+
+    def test_polling_latency(self):
+        self.report('polling', *asyncio.run(self.run_polling()))
+
+    def test_webhook_latency(self):
+        self.report('webhook', *asyncio.run(self.run_webhook()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from work_queue import DONE, LEASED, PENDING, PRODUCT, SQLiteWorkQueue
+
+
+class LeaseOwnershipTest(unittest.TestCase):
+    """Only the worker holding a task's lease can complete or fail it"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.queue = SQLiteWorkQueue(os.path.join(directory.name, 'queue.db'))
+        self.queue.enqueue('job', PRODUCT, {'url': 'https://www.amazon.in/dp/B000000001'})
+
+    def test_expired_lease_cannot_touch_the_new_owners_task(self):
+        stale = self.queue.lease('worker-a', visibility_timeout=0.05)
+        time.sleep(0.1)
+        current = self.queue.lease('worker-b', visibility_timeout=60)
+        self.assertEqual(current['id'], stale['id'])
+
+        self.assertFalse(self.queue.fail(stale['id'], 'worker-a', 'too slow'))
+        self.assertFalse(self.queue.complete(stale['id'], 'worker-a', {'stale': True}))
+        self.assertEqual(self.queue.job_status('job')[LEASED], 1)
+
+        self.assertTrue(self.queue.complete(current['id'], 'worker-b', {'fresh': True}))
+        self.assertEqual(self.queue.results('job'), [{'fresh': True}])
+        self.assertEqual(self.queue.job_status('job')[DONE], 1)
+
+    def test_owner_can_fail_a_task_back_to_pending(self):
+        task = self.queue.lease('worker-a')
+        self.assertTrue(self.queue.fail(task['id'], 'worker-a', 'captcha'))
+        self.assertEqual(self.queue.job_status('job')[PENDING], 1)
+        self.assertFalse(self.queue.complete(task['id'], 'worker-a', {'late': True}))
+
+
+if __name__ == '__main__':
+    unittest.main()
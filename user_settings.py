@@ -8,6 +8,13 @@ def get_user_settings(user_id):
     except FileNotFoundError:
         return {}
 
+def load_all_user_settings():
+    try:
+        with open('user_settings.json', 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
 def set_user_settings(user_id, settings):
     data = {}
     try:
@@ -0,0 +1,219 @@
+import asyncio
+import hmac
+import json
+import logging
+import time
+
+from telegram import Update
+from telegram.ext import Application
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_SIZE = 1024 * 1024  # Telegram updates are far smaller than this
+
+STATUS_TEXT = {
+    200: 'OK', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found',
+    405: 'Method Not Allowed', 413: 'Payload Too Large', 503: 'Service Unavailable',
+}
+
+
+class WebhookReceiver:
+    """Minimal asyncio HTTP receiver for Telegram webhook updates.
+
+    Requests are checked against the secret token Telegram echoes in
+    X-Telegram-Bot-Api-Secret-Token, then put on a bounded queue that
+    `workers` tasks drain into `application.process_update`. When the queue
+    is full the receiver answers 503 so Telegram redelivers later instead
+    of us buffering without limit.
+
+    It speaks plain HTTP only. Telegram delivers webhooks over HTTPS, so a
+    TLS terminator has to sit in front and forward to `listen`:`port`.
+    """
+
+    def __init__(self, application, listen='0.0.0.0', port=8443, path='/telegram',
+                 secret_token=None, queue_size=100, workers=4):
+        self.application = application
+        self.listen = listen
+        self.port = port
+        self.path = path
+        self.secret_token = secret_token
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.worker_count = workers
+        self.server = None
+        self._workers = []
+        self._connections = set()
+        self.stats = {
+            'received': 0, 'processed': 0, 'rejected': 0, 'dropped': 0, 'errors': 0,
+            'total_latency': 0.0, 'max_latency': 0.0,
+        }
+
+    async def start(self):
+        """Start listening and spawn the worker tasks"""
+        self.server = await asyncio.start_server(self._handle_connection, self.listen, self.port)
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.worker_count)]
+        logger.info(f"Webhook receiver listening on {self.listen}:{self.port}{self.path} "
+                    f"({self.worker_count} workers)")
+
+    async def serve_forever(self):
+        await self.server.serve_forever()
+
+    async def stop(self):
+        """Stop accepting updates, let workers finish the queue, then cancel them"""
+        if self.server is not None:
+            self.server.close()
+            for writer in list(self._connections):
+                writer.close()
+            await self.server.wait_closed()
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=30)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropping {self.queue.qsize()} queued updates on shutdown")
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    @property
+    def average_latency(self):
+        """Mean seconds from receiving an update to its handlers finishing"""
+        if not self.stats['processed']:
+            return 0.0
+        return self.stats['total_latency'] / self.stats['processed']
+
+    async def _worker(self, number):
+        while True:
+            received_at, data = await self.queue.get()
+            try:
+                update = Update.de_json(data, self.application.bot)
+                await self.application.process_update(update)
+                latency = time.monotonic() - received_at
+                self.stats['processed'] += 1
+                self.stats['total_latency'] += latency
+                self.stats['max_latency'] = max(self.stats['max_latency'], latency)
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"Webhook worker {number} failed to process update: {str(e)}")
+            finally:
+                self.queue.task_done()
+
+    async def _handle_connection(self, reader, writer):
+        self._connections.add(writer)
+        try:
+            # Telegram keeps connections alive, so serve requests until it closes
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                status, keep_alive = self._accept(*request)
+                await self._respond(writer, status, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            logger.warning(f"Webhook connection error: {str(e)}")
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def _read_request(self, reader):
+        """Read one HTTP/1.1 request. Returns (method, path, headers, body) or None on EOF."""
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        parts = request_line.decode('latin-1').split()
+        if len(parts) != 3:
+            return None
+        method, path, _ = parts
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get('content-length', '0') or 0)
+        if length > MAX_BODY_SIZE:
+            return method, path, headers, None
+        body = await reader.readexactly(length) if length else b''
+        return method, path, headers, body
+
+    def _accept(self, method, path, headers, body):
+        """Validate a request and enqueue its update. Returns (status, keep_alive)."""
+        keep_alive = headers.get('connection', '').lower() != 'close'
+        if path.split('?', 1)[0] != self.path:
+            return 404, keep_alive
+        if method != 'POST':
+            return 405, keep_alive
+        if self.secret_token:
+            supplied = headers.get('x-telegram-bot-api-secret-token', '')
+            if not hmac.compare_digest(supplied, self.secret_token):
+                self.stats['rejected'] += 1
+                return 403, keep_alive
+        if body is None:
+            return 413, False
+
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return 400, keep_alive
+
+        self.stats['received'] += 1
+        try:
+            self.queue.put_nowait((time.monotonic(), data))
+        except asyncio.QueueFull:
+            self.stats['dropped'] += 1
+            return 503, keep_alive
+        return 200, keep_alive
+
+    async def _respond(self, writer, status, keep_alive):
+        writer.write(
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Length: 0\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1')
+        )
+        await writer.drain()
+
+
+class TimedUpdateQueue(asyncio.Queue):
+    """Update queue that remembers when the poller handed each update over"""
+
+    def __init__(self, maxsize=0):
+        super().__init__(maxsize)
+        self.received_at = {}  # id(update) -> time.monotonic()
+
+    def put_nowait(self, item):
+        self.received_at[id(item)] = time.monotonic()
+        super().put_nowait(item)
+
+
+class LatencyTrackingApplication(Application):
+    """Application that records polling latency the same way WebhookReceiver does.
+
+    Latency runs from the poller queueing an update to its handlers finishing,
+    so the two delivery modes can be compared. Needs a TimedUpdateQueue;
+    updates fed in directly (webhook mode) are not counted here.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.latency_stats = {'processed': 0, 'total_latency': 0.0, 'max_latency': 0.0}
+
+    @property
+    def average_latency(self):
+        if not self.latency_stats['processed']:
+            return 0.0
+        return self.latency_stats['total_latency'] / self.latency_stats['processed']
+
+    async def process_update(self, update):
+        received_at = getattr(self.update_queue, 'received_at', {}).pop(id(update), None)
+        try:
+            await super().process_update(update)
+        finally:
+            if received_at is not None:
+                latency = time.monotonic() - received_at
+                self.latency_stats['processed'] += 1
+                self.latency_stats['total_latency'] += latency
+                self.latency_stats['max_latency'] = max(self.latency_stats['max_latency'], latency)
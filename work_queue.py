@@ -0,0 +1,258 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+
+# Task states
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+# Task kinds
+SEARCH_PAGE = 'search_page'
+PRODUCT = 'product'
+
+
+class CrawlStalled(Exception):
+    """No worker made progress on a crawl job within the idle timeout"""
+
+
+class WorkQueue:
+    """Interface for a leased task queue shared by the bot and crawl workers.
+
+    Tasks belong to a job (one crawl). A worker leases a task for
+    `visibility_timeout` seconds; if it neither completes nor fails it in
+    that time the task becomes visible again and another worker picks it up.
+    Implementations for a networked broker subclass this and register
+    themselves in QUEUE_BACKENDS under their URL scheme.
+    """
+
+    def enqueue(self, job_id, kind, payload, dedup_key=None):
+        """Add a task. Returns False if dedup_key was already queued for this job."""
+        raise NotImplementedError
+
+    def lease(self, worker_id, visibility_timeout=120):
+        """Claim the next visible task, or return None if there is none"""
+        raise NotImplementedError
+
+    def complete(self, task_id, worker_id, result=None):
+        """Mark a task done and store its JSON-serialisable result.
+
+        Only the worker holding the lease may do this; returns False if the
+        lease expired and the task now belongs to someone else.
+        """
+        raise NotImplementedError
+
+    def fail(self, task_id, worker_id, error):
+        """Release a leased task for retry, or mark it failed once out of attempts.
+
+        Like complete(), a no-op returning False unless `worker_id` holds the lease.
+        """
+        raise NotImplementedError
+
+    def job_status(self, job_id):
+        """Task counts by state for a job"""
+        raise NotImplementedError
+
+    def results(self, job_id, kind=None):
+        """Results of the job's completed tasks, optionally of one kind"""
+        raise NotImplementedError
+
+    def delete_job(self, job_id):
+        """Remove all tasks of a job"""
+        raise NotImplementedError
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """WorkQueue stored in a SQLite file, shared by processes on one machine"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            dedup_key TEXT,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            lease_owner TEXT,
+            lease_expires REAL,
+            result TEXT,
+            error TEXT,
+            created_at REAL NOT NULL,
+            UNIQUE (job_id, dedup_key)
+        );
+        CREATE INDEX IF NOT EXISTS tasks_visible ON tasks (status, lease_expires);
+        CREATE INDEX IF NOT EXISTS tasks_job ON tasks (job_id, status);
+    """
+
+    def __init__(self, path, max_attempts=3):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(self.SCHEMA)
+
+    def _connection(self):
+        # sqlite3 connections can't be shared across threads, so keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, job_id, kind, payload, dedup_key=None):
+        cursor = self._connection().execute(
+            "INSERT OR IGNORE INTO tasks (job_id, kind, payload, dedup_key, status, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, kind, json.dumps(payload), dedup_key, PENDING, time.time())
+        )
+        return cursor.rowcount == 1
+
+    def lease(self, worker_id, visibility_timeout=120):
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Leases that expired on their last allowed attempt are given up
+            conn.execute(
+                "UPDATE tasks SET status = ?, error = 'lease expired' "
+                "WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                (FAILED, LEASED, now, self.max_attempts)
+            )
+            row = conn.execute(
+                "SELECT * FROM tasks WHERE status = ? OR (status = ? AND lease_expires < ?) "
+                "ORDER BY id LIMIT 1",
+                (PENDING, LEASED, now)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE tasks SET status = ?, attempts = attempts + 1, lease_owner = ?, "
+                "lease_expires = ? WHERE id = ?",
+                (LEASED, worker_id, now + visibility_timeout, row['id'])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        return {
+            'id': row['id'],
+            'job_id': row['job_id'],
+            'kind': row['kind'],
+            'payload': json.loads(row['payload']),
+            'attempts': row['attempts'] + 1,
+        }
+
+    def complete(self, task_id, worker_id, result=None):
+        cursor = self._connection().execute(
+            "UPDATE tasks SET status = ?, result = ?, lease_expires = NULL "
+            "WHERE id = ? AND status = ? AND lease_owner = ?",
+            (DONE, json.dumps(result), task_id, LEASED, worker_id)
+        )
+        return cursor.rowcount == 1
+
+    def fail(self, task_id, worker_id, error):
+        cursor = self._connection().execute(
+            "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+            "error = ?, lease_owner = NULL, lease_expires = NULL "
+            "WHERE id = ? AND status = ? AND lease_owner = ?",
+            (self.max_attempts, FAILED, PENDING, str(error), task_id, LEASED, worker_id)
+        )
+        return cursor.rowcount == 1
+
+    def job_status(self, job_id):
+        rows = self._connection().execute(
+            "SELECT status, COUNT(*) AS n FROM tasks WHERE job_id = ? GROUP BY status",
+            (job_id,)
+        ).fetchall()
+        status = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        for row in rows:
+            status[row['status']] = row['n']
+        return status
+
+    def results(self, job_id, kind=None):
+        query = "SELECT result FROM tasks WHERE job_id = ? AND status = ?"
+        params = [job_id, DONE]
+        if kind is not None:
+            query += " AND kind = ?"
+            params.append(kind)
+        rows = self._connection().execute(query + " ORDER BY id", params).fetchall()
+        return [json.loads(row['result']) for row in rows if row['result'] is not None]
+
+    def delete_job(self, job_id):
+        self._connection().execute("DELETE FROM tasks WHERE job_id = ?", (job_id,))
+
+
+# URL scheme -> factory taking the parsed URL and queue options.
+# Networked brokers register here.
+QUEUE_BACKENDS = {
+    # sqlite:///relative.db or sqlite:////absolute/path.db
+    'sqlite': lambda url, **kwargs: SQLiteWorkQueue(url.path[1:], **kwargs),
+}
+
+
+def create_work_queue(queue_url, **kwargs):
+    """Create a WorkQueue from a URL such as sqlite:///crawl_queue.db"""
+    url = urlparse(queue_url)
+    factory = QUEUE_BACKENDS.get(url.scheme)
+    if factory is None:
+        raise ValueError(f"Unsupported work queue backend: {url.scheme!r}")
+    return factory(url, **kwargs)
+
+
+def submit_crawl(queue, scraper):
+    """Queue the search pages of a scraper's crawl. Returns the job id."""
+    job_id = uuid.uuid4().hex
+    for page in range(1, scraper.max_pages + 1):
+        queue.enqueue(job_id, SEARCH_PAGE,
+                      {'search_term': scraper.search_term, 'page': page},
+                      dedup_key=f"page:{page}")
+    return job_id
+
+
+def wait_for_crawl(queue, job_id, poll_interval=2, timeout=None, idle_timeout=None):
+    """Block until a crawl job has no pending or leased tasks, then return its products.
+
+    Products come back in the same shape as scrape_search_results(), so they
+    can go straight into filter_best_deals(). If no task finishes for
+    `idle_timeout` seconds the wait stops early: with partial results those
+    are returned, with none CrawlStalled is raised (usually no worker is
+    running).
+    """
+    started = last_progress = time.monotonic()
+    finished = 0
+    while True:
+        status = queue.job_status(job_id)
+        if status[PENDING] == 0 and status[LEASED] == 0:
+            break
+        now = time.monotonic()
+        if status[DONE] + status[FAILED] != finished:
+            finished = status[DONE] + status[FAILED]
+            last_progress = now
+        if timeout is not None and now - started > timeout:
+            print(f"Crawl {job_id} timed out with {status[PENDING] + status[LEASED]} tasks left")
+            break
+        if idle_timeout is not None and now - last_progress > idle_timeout:
+            if not finished:
+                raise CrawlStalled(f"No crawl worker picked up job {job_id} in {idle_timeout:.0f}s; "
+                                   f"is worker.py running?")
+            print(f"Crawl {job_id} stalled for {idle_timeout:.0f}s with "
+                  f"{status[PENDING] + status[LEASED]} tasks left; returning partial results")
+            break
+        time.sleep(poll_interval)
+
+    products = [p for p in queue.results(job_id, kind=PRODUCT) if p and p.get('is_available')]
+    print(f"Crawl {job_id} finished: {status[DONE]} tasks done, {status[FAILED]} failed, "
+          f"{len(products)} available products")
+    return products
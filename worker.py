@@ -0,0 +1,138 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import socket
+import time
+
+from amazon_scraper import AmazonDealsScraper, extract_asin
+from config import Config
+from fetch_control import ThrottledFetcher, OK, NOT_FOUND
+from identity_pool import IdentityPool
+from work_queue import create_work_queue, SEARCH_PAGE, PRODUCT
+
+# Configure logging
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+
+class CrawlWorker:
+    """Leases search-page and product tasks from the work queue and runs them"""
+
+    def __init__(self, queue, worker_id, fetcher):
+        self.queue = queue
+        self.worker_id = worker_id
+        self.fetcher = fetcher
+
+    def make_scraper(self, search_term):
+        return AmazonDealsScraper(
+            search_term=search_term,
+            affiliate_tag=Config.AFFILIATE_TAG,
+            fetcher=self.fetcher
+        )
+
+    def run_task(self, task):
+        """Run one leased task, completing or failing it on the queue"""
+        payload = task['payload']
+        scraper = self.make_scraper(payload['search_term'])
+
+        if task['kind'] == SEARCH_PAGE:
+            kind, product_urls = scraper.fetch_search_page_urls(payload['page'])
+            if kind != OK:
+                self.queue.fail(task['id'], self.worker_id, f"search page {payload['page']}: {kind}")
+                return
+            queued = skipped = 0
+            for url in product_urls:
+                if queued >= 10:
+                    break
+                # Keyed by ASIN so the same product on another page is fetched once per job
+                if self.queue.enqueue(task['job_id'], PRODUCT,
+                                      {'search_term': payload['search_term'],
+                                       'page': payload['page'], 'url': url},
+                                      dedup_key=f"asin:{extract_asin(url)}"):
+                    queued += 1
+                else:
+                    skipped += 1
+            self.queue.complete(task['id'], self.worker_id, {'product_urls': queued, 'duplicates': skipped})
+
+        elif task['kind'] == PRODUCT:
+            kind, details = scraper.fetch_product(payload['url'], payload['page'])
+            if kind == NOT_FOUND:
+                self.queue.complete(task['id'], self.worker_id, None)
+            elif kind != OK:
+                self.queue.fail(task['id'], self.worker_id, f"product: {kind}")
+            else:
+                self.queue.complete(task['id'], self.worker_id, details)
+
+        else:
+            self.queue.fail(task['id'], self.worker_id, f"unknown task kind {task['kind']!r}")
+
+    def run(self, poll_interval=2, stop_when_idle=False):
+        """Lease and run tasks until interrupted (or until the queue is empty)"""
+        logger.info(f"Worker {self.worker_id} started")
+        while True:
+            task = self.queue.lease(self.worker_id, Config.WORK_QUEUE_VISIBILITY_TIMEOUT)
+            if task is None:
+                if stop_when_idle:
+                    break
+                time.sleep(poll_interval)
+                continue
+            try:
+                self.run_task(task)
+            except Exception as e:
+                logger.error(f"Worker {self.worker_id} task {task['id']} error: {str(e)}")
+                self.queue.fail(task['id'], self.worker_id, str(e))
+        logger.info(f"Worker {self.worker_id} stopped")
+
+
+def run_worker_process(index, stop_when_idle=False):
+    """Entry point for one worker process"""
+    queue = create_work_queue(Config.WORK_QUEUE_URL, max_attempts=Config.WORK_QUEUE_MAX_ATTEMPTS)
+    fetcher = ThrottledFetcher(
+        initial_rate=Config.FETCH_INITIAL_RATE,
+        max_rate=Config.FETCH_MAX_RATE,
+        max_retries=Config.FETCH_MAX_RETRIES,
+        failure_threshold=Config.BREAKER_FAILURE_THRESHOLD,
+        reset_timeout=Config.BREAKER_RESET_TIMEOUT,
+        max_wait=Config.BREAKER_MAX_WAIT,
+        identity_pool=IdentityPool.from_defaults(
+            proxies=Config.IDENTITY_PROXIES,
+            cool_off=Config.IDENTITY_COOL_OFF
+        )
+    )
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-{index}"
+    try:
+        CrawlWorker(queue, worker_id, fetcher).run(stop_when_idle=stop_when_idle)
+    except KeyboardInterrupt:
+        logger.info(f"Worker {worker_id} stopped by user")
+
+
+def main():
+    """Run crawl workers against the shared work queue"""
+    parser = argparse.ArgumentParser(description="Amazon deals crawl worker")
+    parser.add_argument('--processes', type=int, default=1, help="worker processes to start")
+    parser.add_argument('--once', action='store_true', help="exit when the queue is empty")
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        run_worker_process(0, args.once)
+        return
+
+    processes = [
+        multiprocessing.Process(target=run_worker_process, args=(i, args.once))
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        logger.info("Workers stopped by user")
+
+
+if __name__ == '__main__':
+    main()